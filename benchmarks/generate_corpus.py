@@ -0,0 +1,179 @@
+import argparse
+import email.message
+import email.utils
+import json
+import os
+import random
+import shutil
+import sys
+
+# Generates a reproducible synthetic corpus covering every handler type:
+# plain text, .docx, text-layer PDFs, scanned (image-only) PDFs, images,
+# .eml/.mbox mail and, if samples are supplied, .msg files.
+#
+#   python benchmarks/generate_corpus.py out/corpus --files 200 --seed 1
+
+WORDS = (
+    "contract invoice payment delivery schedule party agreement clause term notice "
+    "report quarter revenue growth forecast budget risk audit compliance policy "
+    "project milestone release review meeting action owner deadline status update "
+    "customer supplier order shipment warehouse inventory price discount tax total"
+).split()
+
+KINDS = ("txt", "docx", "pdf_text", "pdf_scanned", "image", "eml", "mbox", "msg")
+DEFAULT_MIX = {"txt": 30, "docx": 15, "pdf_text": 15, "pdf_scanned": 10, "image": 10, "eml": 10, "mbox": 5, "msg": 5}
+
+def paragraph(rng, sentences=5):
+    out = []
+    for _ in range(sentences):
+        words = rng.choices(WORDS, k=rng.randint(8, 18))
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+def paragraphs(rng, count):
+    return [paragraph(rng) for _ in range(count)]
+
+def _render_text_image(lines, width=1240, line_height=28):
+    from PIL import Image, ImageDraw
+    height = max(200, 40 + line_height * len(lines))
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 20 + i * line_height), line, fill=0)
+    return image
+
+def _wrap(text, width=100):
+    line, lines = [], []
+    for word in text.split():
+        if sum(len(w) + 1 for w in line) + len(word) > width:
+            lines.append(" ".join(line))
+            line = []
+        line.append(word)
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+def write_txt(path, rng, scale):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs(rng, 5 * scale)))
+
+def write_docx(path, rng, scale):
+    import docx
+    document = docx.Document()
+    for text in paragraphs(rng, 5 * scale):
+        document.add_paragraph(text)
+    document.save(path)
+
+def write_pdf_text(path, rng, scale):
+    import fitz
+    doc = fitz.open()
+    for _ in range(2 * scale):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n\n".join(paragraphs(rng, 4)), fontsize=10)
+    doc.save(path)
+    doc.close()
+
+def write_pdf_scanned(path, rng, scale):
+    import fitz
+    doc = fitz.open()
+    for _ in range(max(1, scale)):
+        lines = _wrap(" ".join(paragraphs(rng, 3)))
+        image = _render_text_image(lines)
+        buffer = _png_bytes(image)
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buffer)
+    doc.save(path)
+    doc.close()
+
+def _png_bytes(image):
+    import io
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def write_image(path, rng, scale):
+    _render_text_image(_wrap(paragraph(rng, 3 * scale))).save(path)
+
+def _email(rng, index):
+    message = email.message.EmailMessage()
+    message["From"] = f"sender{index}@example.com"
+    message["To"] = "team@example.com"
+    message["Subject"] = " ".join(rng.choices(WORDS, k=5)).capitalize()
+    message["Date"] = email.utils.formatdate(1700000000 + index * 3600)
+    message.set_content("\n\n".join(paragraphs(rng, 4)))
+    return message
+
+def write_eml(path, rng, scale):
+    with open(path, "wb") as f:
+        f.write(bytes(_email(rng, rng.randint(0, 10_000))))
+
+def write_mbox(path, rng, scale):
+    import mailbox
+    box = mailbox.mbox(path, create=True)
+    try:
+        for i in range(5 * scale):
+            box.add(_email(rng, i))
+    finally:
+        box.close()
+
+WRITERS = {
+    "txt": ("txt", write_txt),
+    "docx": ("docx", write_docx),
+    "pdf_text": ("pdf", write_pdf_text),
+    "pdf_scanned": ("pdf", write_pdf_scanned),
+    "image": ("png", write_image),
+    "eml": ("eml", write_eml),
+    "mbox": ("mbox", write_mbox),
+}
+
+def generate(out_dir, files, seed=0, scale=1, mix=None, msg_samples=None, subdirs=8):
+    # No library can write Outlook .msg files, so those are copied from
+    # msg_samples when given and left out of the mix otherwise.
+    rng = random.Random(seed)
+    mix = dict(mix or DEFAULT_MIX)
+    samples = []
+    if msg_samples:
+        samples = sorted(os.path.join(msg_samples, f) for f in os.listdir(msg_samples) if f.lower().endswith(".msg"))
+    if not samples:
+        mix.pop("msg", None)
+    kinds = sorted(mix)
+    weights = [mix[k] for k in kinds]
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"seed": seed, "scale": scale, "files": []}
+    for i in range(files):
+        kind = rng.choices(kinds, weights)[0]
+        folder = os.path.join(out_dir, f"dir{i % subdirs:02d}")
+        os.makedirs(folder, exist_ok=True)
+        if kind == "msg":
+            path = os.path.join(folder, f"{kind}_{i:05d}.msg")
+            shutil.copyfile(samples[i % len(samples)], path)
+        else:
+            ext, writer = WRITERS[kind]
+            path = os.path.join(folder, f"{kind}_{i:05d}.{ext}")
+            writer(path, random.Random(rng.random()), scale)
+        manifest["files"].append({"path": os.path.relpath(path, out_dir), "kind": kind, "bytes": os.path.getsize(path)})
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1, help="multiplies the size of each document")
+    parser.add_argument("--msg-samples", help="folder of real .msg files to copy into the corpus")
+    parser.add_argument("--kinds", help=f"comma-separated subset of: {', '.join(KINDS)}")
+    args = parser.parse_args(argv)
+
+    mix = DEFAULT_MIX
+    if args.kinds:
+        mix = {k: DEFAULT_MIX[k] for k in args.kinds.split(",") if k in DEFAULT_MIX}
+    manifest = generate(args.out_dir, args.files, args.seed, args.scale, mix, args.msg_samples)
+    total = sum(f["bytes"] for f in manifest["files"])
+    print(f"Wrote {len(manifest['files'])} files ({total / 1048576:.1f} MB) to {args.out_dir}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Reproducible throughput/latency report for the headless pipeline.
+#
+#   python benchmarks/run_benchmarks.py --files 200 --seed 1 --output report.json
+#   python benchmarks/run_benchmarks.py --corpus path/to/folder --asks 20 --latency-ms 800
+#
+# Stages: walk (discovering supported files), extract (each handler called
+# directly, one file at a time, for per-file latency), ingest (the threaded
+# and multi-process engine end to end) and ask (prompts answered through the
+# pooled client against benchmarks/stub_server.py). Caches are off unless
+# --with-caches is given, so every run measures cold work.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+sys.path.insert(0, HERE)
+
+import generate_corpus
+import stub_server
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def latency_summary(seconds):
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 2) if seconds else None,
+        "p95_ms": round(percentile(seconds, 95) * 1000, 2) if seconds else None,
+        "mean_ms": round(statistics.fmean(seconds) * 1000, 2) if seconds else None,
+    }
+
+class RssSampler:
+    # Peak resident set size of this process plus its workers while a stage
+    # runs. Uses psutil when installed; otherwise falls back to getrusage,
+    # whose high-water mark never resets, so later stages report the max so far.
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _sample(self):
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak = max(self.peak, self._sample())
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self._process is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        else:
+            self.peak = _rusage_peak()
+
+def _rusage_peak():
+    try:
+        import resource
+    except ImportError:
+        return 0
+    scale = 1 if sys.platform == "darwin" else 1024  # macOS reports bytes, Linux KiB
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + children) * scale
+
+def throughput(files, size, seconds):
+    return {
+        "seconds": round(seconds, 3),
+        "files": files,
+        "mb": round(size / 1048576, 2),
+        "files_per_s": round(files / seconds, 2) if seconds else None,
+        "mb_per_s": round(size / 1048576 / seconds, 2) if seconds else None,
+    }
+
+def bench_walk(root, scanner):
+    started = time.perf_counter()
+    paths = scanner.scan(root).paths
+    elapsed = time.perf_counter() - started
+    return sorted(paths), elapsed
+
+def bench_extract(paths, registry):
+    per_handler = {}
+    errors = 0
+    started = time.perf_counter()
+    for path in paths:
+        handler = registry.get(os.path.splitext(path)[1].lower())
+        t0 = time.perf_counter()
+        try:
+            handler.read(path)
+        except Exception:
+            errors += 1
+        entry = per_handler.setdefault(handler.name, {"seconds": [], "bytes": 0})
+        entry["seconds"].append(time.perf_counter() - t0)
+        entry["bytes"] += os.path.getsize(path)
+    elapsed = time.perf_counter() - started
+
+    handlers = {}
+    for name, entry in sorted(per_handler.items()):
+        handlers[name] = {
+            **throughput(len(entry["seconds"]), entry["bytes"], sum(entry["seconds"])),
+            **latency_summary(entry["seconds"]),
+        }
+    size = sum(os.path.getsize(p) for p in paths)
+    return {**throughput(len(paths), size, elapsed), "errors": errors, "handlers": handlers}
+
+def bench_ingest(pipeline, root, size):
+    started = time.perf_counter()
+    corpus = pipeline.ingest(root)
+    elapsed = time.perf_counter() - started
+    return {**throughput(len(corpus), size, elapsed), "chars": corpus.total_chars()}, corpus
+
+def bench_ask(pipeline, corpus, asks, concurrency):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pipeline.set_corpus(corpus)
+    if len(corpus):
+        pipeline.install_index(*pipeline.build_index(corpus))
+    seconds, errors = [], 0
+
+    def one(i):
+        t0 = time.perf_counter()
+        pipeline.ask(f"Benchmark question {i}: summarize the key points.", use_cache=False, stream=False)
+        return time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one, i) for i in range(asks)]:
+            try:
+                seconds.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "asks_per_s": round(asks / elapsed, 2) if elapsed else None,
+        "errors": errors,
+        **latency_summary(seconds),
+    }
+
+def format_report(report):
+    lines = [f"Benchmark: {report['corpus']['files']} files, {report['corpus']['mb']} MB (seed {report['corpus']['seed']})"]
+    for name, stage in report["stages"].items():
+        parts = [f"{name:<8}"]
+        if stage.get("files_per_s") is not None:
+            parts.append(f"{stage['files_per_s']:>8.1f} files/s {stage['mb_per_s']:>7.2f} MB/s")
+        if stage.get("asks_per_s") is not None:
+            parts.append(f"{stage['asks_per_s']:>8.1f} asks/s")
+        if stage.get("p50_ms") is not None:
+            parts.append(f"p50 {stage['p50_ms']:.1f} ms  p95 {stage['p95_ms']:.1f} ms")
+        parts.append(f"peak RSS {stage['peak_rss_mb']:.0f} MB")
+        lines.append("  ".join(parts))
+        for handler, h in stage.get("handlers", {}).items():
+            lines.append(f"  {handler:<8}{h['files']:>5} files {h['mb_per_s'] or 0:>7.2f} MB/s  "
+                         f"p50 {h['p50_ms']:.1f} ms  p95 {h['p95_ms']:.1f} ms")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction and prompting.")
+    parser.add_argument("--corpus", help="existing folder to benchmark instead of a generated corpus")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--kinds", help="comma-separated subset of generated kinds")
+    parser.add_argument("--asks", type=int, default=10, help="prompts to send to the stub endpoint (0 to skip)")
+    parser.add_argument("--ask-concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--with-caches", action="store_true", help="leave the extraction/response/OCR caches on")
+    parser.add_argument("--skip-extract", action="store_true", help="skip the per-handler stage")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    server = stub_server.start_server(0, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    # Settings are read at import time, so they go into the environment first
+    os.environ["GEMINI_MODEL"] = "stub"
+    os.environ["STUB_MODEL_URL"] = stub_server.generate_content_url(server)
+    if not args.with_caches:
+        os.environ["EXTRACTION_CACHE_MB"] = "0"
+        os.environ["RESPONSE_CACHE_MB"] = "0"
+        os.environ["OCR_CACHE_MB"] = "0"
+
+    import config
+    from file_readers import FILE_HANDLERS
+    from file_scanner import FileScanner
+    from pipeline import CopilotPipeline
+
+    with tempfile.TemporaryDirectory(prefix="copilot-bench-") as tmp:
+        root = args.corpus
+        if not root:
+            root = os.path.join(tmp, "corpus")
+            mix = generate_corpus.DEFAULT_MIX
+            if args.kinds:
+                mix = {k: mix[k] for k in args.kinds.split(",") if k in mix}
+            generate_corpus.generate(root, args.files, args.seed, args.scale, mix)
+
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "config": {
+                "extraction_workers": config.EXTRACTION_WORKERS,
+                "extraction_processes": config.EXTRACTION_PROCESSES,
+                "pdf_pages_per_task": config.PDF_PAGES_PER_TASK,
+                "gemini_max_concurrency": config.GEMINI_MAX_CONCURRENCY,
+                "stub_latency_ms": args.latency_ms,
+                "stub_jitter_ms": args.jitter_ms,
+                "stub_error_rate": args.error_rate,
+                "caches": args.with_caches,
+            },
+            "stages": {},
+        }
+
+        stages = report["stages"]
+        with RssSampler() as rss:
+            scanner = FileScanner(FILE_HANDLERS, ignore=config.SCAN_IGNORE,
+                                  default_ignores=config.SCAN_DEFAULT_IGNORES, gitignore=config.SCAN_GITIGNORE)
+            paths, elapsed = bench_walk(root, scanner)
+        size = sum(os.path.getsize(p) for p in paths)
+        report["corpus"] = {"path": args.corpus, "seed": args.seed, "scale": args.scale,
+                            "files": len(paths), "mb": round(size / 1048576, 2)}
+        stages["walk"] = {**throughput(len(paths), size, elapsed), "peak_rss_mb": rss.peak / 1048576}
+
+        if not args.skip_extract:
+            with RssSampler() as rss:
+                stages["extract"] = bench_extract(paths, FILE_HANDLERS)
+            stages["extract"]["peak_rss_mb"] = rss.peak / 1048576
+
+        pipeline = CopilotPipeline(persist_conversation=False)
+        try:
+            with RssSampler() as rss:
+                stages["ingest"], corpus = bench_ingest(pipeline, root, size)
+            stages["ingest"]["peak_rss_mb"] = rss.peak / 1048576
+
+            if args.asks > 0:
+                with RssSampler() as rss:
+                    stages["ask"] = bench_ask(pipeline, corpus, args.asks, args.ask_concurrency)
+                stages["ask"]["peak_rss_mb"] = rss.peak / 1048576
+                stages["ask"]["stub_requests"] = server.RequestHandlerClass.requests
+        finally:
+            pipeline.close()
+            server.shutdown()
+
+    for stage in stages.values():
+        stage["peak_rss_mb"] = round(stage["peak_rss_mb"], 1)
+    print(format_report(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Gemini endpoint with configurable latency and
+# error rate. It answers both the generateContent shape used by
+# StubModel(url=...) and the /v1/ask shape used by api_handler.
+#
+#   python benchmarks/stub_server.py --port 8765 --latency-ms 400 --error-rate 0.05
+#   set GEMINI_MODEL=stub and STUB_MODEL_URL=http://127.0.0.1:8765/v1beta/models/stub:generateContent
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency_ms = 0
+    jitter_ms = 0
+    error_rate = 0.0
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+    requests = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with self.rng_lock:
+            type(self).requests += 1
+            delay = self.latency_ms + self.rng.uniform(0, self.jitter_ms)
+            fail = self.rng.random() < self.error_rate
+        time.sleep(delay / 1000)
+        if fail:
+            self._send_json(self.rng.choice([429, 503]), {"error": {"message": "stub overloaded"}})
+            return
+
+        if self.path.endswith(":generateContent"):
+            prompt = "".join(part.get("text", "") for c in payload.get("contents", []) for part in c.get("parts", []))
+            text = f"[stub answer] {len(prompt)} chars in prompt."
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]})
+        elif self.path.endswith("/ask"):
+            text = f"[stub answer] {len(payload.get('prompt', ''))} chars in prompt."
+            self._send_json(200, {"data": {"text": text}})
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+def start_server(port=0, latency_ms=0, jitter_ms=0, error_rate=0.0, seed=0):
+    # Returns the running server; call server.shutdown() to stop it
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate,
+        "rng": random.Random(seed), "rng_lock": threading.Lock(), "requests": 0,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def generate_content_url(server, model="stub"):
+    return f"http://127.0.0.1:{server.server_port}/v1beta/models/{model}:generateContent"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake Gemini endpoint.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = start_server(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    print(f"Stub Gemini endpoint: {generate_content_url(server)}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
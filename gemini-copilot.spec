@@ -6,7 +6,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Imported by name through lazy_modules.load(), which analysis can't see
+    hiddenimports=[
+        'fitz', 'docx', 'openpyxl', 'extract_msg', 'bs4', 'pytesseract', 'tesserocr',
+        'PIL.Image', 'google.generativeai', 'google.generativeai.caching',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,11 +1,9 @@
 import requests
-import os
-from dotenv import load_dotenv
+import config
+from gemini_client import get_client
 
-load_dotenv()
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = "https://api.gemini.com/v1/ask"
+GEMINI_API_KEY = config.GEMINI_API_KEY
+GEMINI_API_URL = config.GEMINI_API_URL
 
 def send_request_to_gemini(prompt):
     headers = {
@@ -19,9 +17,8 @@ def send_request_to_gemini(prompt):
     }
     
     try:
-        response = requests.post(GEMINI_API_URL, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
+        # Shared session, timeout, rate limiting and retries live in the client
+        return get_client().post_json(GEMINI_API_URL, data, headers=headers)
     except requests.exceptions.HTTPError as http_err:
         return {"error": f"HTTP error occurred: {http_err}"}
     except Exception as err:
@@ -30,4 +27,4 @@ def send_request_to_gemini(prompt):
 def process_response(response):
     if "error" in response:
         return response["error"]
-    return response.get("data", {}).get("text", "No response text found.")
\ No newline at end of file
+    return response.get("data", {}).get("text", "No response text found.")
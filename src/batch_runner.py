@@ -0,0 +1,106 @@
+import csv
+import json
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from metrics import in_current_run
+
+BATCH_PROMPT = (
+    "{system_instruction}\n\n"
+    "--- INSTRUCTION ---\n{instruction}\n\n"
+    "--- FILE: {filename} ---\n{text}"
+)
+
+@dataclass
+class BatchResult:
+    index: int
+    filename: str
+    answer: str = ""
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+
+# Applies one instruction to every file independently on a thread pool.
+# Each file is retried on its own, so one failure doesn't sink the batch.
+class BatchRunner:
+    def __init__(self, generate: Callable[[str], str], concurrency: int = 4,
+                 max_attempts: int = 3, retry_delay: float = 2.0):
+        self.generate = generate
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+
+    def _run_one(self, index: int, filename: str, text: str, build_prompt: Callable[[str, str], str],
+                 should_stop: Callable[[], bool]) -> BatchResult:
+        result = BatchResult(index, filename)
+        started = time.perf_counter()
+        prompt = None
+        while result.attempts < self.max_attempts and not should_stop():
+            result.attempts += 1
+            try:
+                if prompt is None:
+                    prompt = build_prompt(filename, text)
+                result.answer = self.generate(prompt)
+                result.error = None
+                break
+            except Exception as e:
+                result.error = str(e) or type(e).__name__
+                if result.attempts < self.max_attempts:
+                    time.sleep(random.uniform(0, self.retry_delay * result.attempts))
+        if should_stop() and not result.answer and result.error is None:
+            result.error = "Cancelled"
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def run(self, instruction: str, documents: Iterable[Tuple[str, str]], system_instruction: str = "",
+            prepare: Optional[Callable[[str, str], str]] = None,
+            on_result: Optional[Callable[[BatchResult, int, int], None]] = None,
+            should_stop: Callable[[], bool] = lambda: False, total: Optional[int] = None) -> List[BatchResult]:
+        # prepare(filename, text) can shrink a file's text (e.g. condense an
+        # oversized file) and runs on the worker, inside the retry loop.
+        # Documents are taken from the iterable only as workers free up, so
+        # a lazy one (with its total given) keeps just a few texts in memory.
+        def build_prompt(filename, text):
+            if prepare:
+                text = prepare(filename, text)
+            return BATCH_PROMPT.format(system_instruction=system_instruction, instruction=instruction,
+                                       filename=filename, text=text)
+
+        if total is None:
+            documents = list(documents)
+            total = len(documents)
+        results: List[BatchResult] = []
+
+        def collect(futures):
+            for future in futures:
+                results.append(future.result())
+                if on_result:
+                    on_result(results[-1], len(results), total)
+
+        run_one = in_current_run(self._run_one)  # API spans from the workers count towards the caller's run
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            pending = set()
+            for i, (filename, text) in enumerate(documents):
+                pending.add(pool.submit(run_one, i, filename, text, build_prompt, should_stop))
+                if len(pending) >= self.concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(as_completed(pending))
+        results.sort(key=lambda r: r.index)
+        return results
+
+def export_jsonl(results: List[BatchResult], path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+
+def export_csv(results: List[BatchResult], path: str):
+    # utf-8-sig so Excel picks up the encoding
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["File", "Answer", "Error", "Attempts", "Seconds"])
+        for result in results:
+            writer.writerow([result.filename, result.answer, result.error or "", result.attempts, f"{result.seconds:.2f}"])
@@ -0,0 +1,126 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from dataclasses import asdict
+from typing import List
+
+from pipeline import CopilotPipeline
+
+# Headless entry point: runs the same ingest -> ask pipeline as the GUI over
+# one or more paths, or over a JSONL job file, and reports throughput.
+#
+#   python src/cli.py report.pdf -i "Summarize this"
+#   python src/cli.py --jobs jobs.jsonl --output results.jsonl
+#
+# Each job line is {"path": ..., "instruction": ..., "batch": false}, with an
+# optional "ocr_languages" (e.g. "eng+deu") for scanned files in that job.
+
+def _load_jobs(path: str) -> List[dict]:
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = json.loads(line)
+            if not job.get("path") or not job.get("instruction"):
+                raise ValueError(f"{path}:{line_no}: each job needs 'path' and 'instruction'")
+            jobs.append(job)
+    return jobs
+
+def _run_job(pipeline: CopilotPipeline, job: dict, use_cache: bool) -> dict:
+    record = {"path": job["path"], "instruction": job["instruction"], "batch": bool(job.get("batch"))}
+    pipeline.conversation.clear()
+    try:
+        started = time.perf_counter()
+        corpus = pipeline.load(job["path"], ocr_languages=job.get("ocr_languages"))
+        record["ingest_seconds"] = round(time.perf_counter() - started, 3)
+        record["files"] = len(corpus)
+        record["chars"] = corpus.total_chars()
+        if corpus.is_empty():
+            raise ValueError("no readable content found")
+
+        started = time.perf_counter()
+        if record["batch"]:
+            record["results"] = [asdict(r) for r in pipeline.run_batch(job["instruction"])]
+        else:
+            record["answer"] = pipeline.ask(job["instruction"], use_cache=use_cache, stream=False)
+        record["ask_seconds"] = round(time.perf_counter() - started, 3)
+    except Exception as e:
+        record["error"] = str(e) or type(e).__name__
+    return record
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run Gemini Copilot without the GUI.")
+    parser.add_argument("paths", nargs="*", help="files or folders to analyse")
+    parser.add_argument("-i", "--instruction", help="instruction to run against each path")
+    parser.add_argument("--batch", action="store_true", help="apply the instruction to each file separately")
+    parser.add_argument("--jobs", help="JSONL file with one {path, instruction, batch} job per line")
+    parser.add_argument("-o", "--output", help="write one JSON result per job to this file")
+    parser.add_argument("--ocr-lang", help="Tesseract languages for scanned files, e.g. eng+deu (default OCR_LANGUAGES)")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't print progress to stderr")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also print one line per file read")
+    args = parser.parse_args(argv)
+
+    jobs = []
+    if args.jobs:
+        try:
+            jobs.extend(_load_jobs(args.jobs))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.paths:
+        if not args.instruction:
+            parser.error("--instruction is required when paths are given")
+        jobs.extend({"path": p, "instruction": args.instruction, "batch": args.batch, "ocr_languages": args.ocr_lang}
+                    for p in args.paths)
+    if not jobs:
+        parser.error("give at least one path or --jobs")
+
+    def emit(message):
+        msg_type, data = message
+        if args.quiet:
+            return
+        if msg_type == "log" or (msg_type == "detail" and args.verbose):
+            sys.stderr.write(data)
+
+    pipeline = CopilotPipeline(emit=emit, persist_conversation=False)
+    if not pipeline.has_credentials():
+        print("GEMINI_API_KEY not found (set GEMINI_MODEL=stub to run offline).", file=sys.stderr)
+        return 2
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    started = time.perf_counter()
+    files = chars = failed = 0
+    try:
+        for job in jobs:
+            record = _run_job(pipeline, job, use_cache=not args.no_cache)
+            files += record.get("files", 0)
+            chars += record.get("chars", 0)
+            failed += "error" in record
+            if output:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+            elif "error" in record:
+                print(f"=== {record['path']}: ERROR {record['error']}\n")
+            elif record["batch"]:
+                for result in record["results"]:
+                    print(f"=== {record['path']} :: {result['filename']}\n{result['error'] or result['answer']}\n")
+            else:
+                print(f"=== {record['path']}\n{record['answer']}\n")
+    finally:
+        if output:
+            output.close()
+        pipeline.close()
+
+    elapsed = time.perf_counter() - started
+    if not args.quiet:
+        print(f"{len(jobs)} job(s), {failed} failed, {files} files, {chars / 1048576:.1f} MB of text "
+              f"in {elapsed:.1f}s ({files / elapsed if elapsed else 0:.1f} files/s)", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
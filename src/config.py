@@ -0,0 +1,164 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring invalid value for {name}: {value!r}")
+        return default
+
+def _default_data_dir() -> str:
+    base = os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "GeminiCopilot")
+
+DATA_DIR = os.getenv("COPILOT_DATA_DIR") or _default_data_dir()
+
+# --- Scanning ---
+# Folders such as .git, node_modules and virtualenvs are pruned, as is anything
+# a .gitignore excludes; SCAN_IGNORE adds comma-separated patterns in the same syntax
+SCAN_IGNORE = [p.strip() for p in (os.getenv("SCAN_IGNORE") or "").split(",") if p.strip()]
+SCAN_DEFAULT_IGNORES = _env_int("SCAN_DEFAULT_IGNORES", 1) != 0
+SCAN_GITIGNORE = _env_int("SCAN_GITIGNORE", 1) != 0
+SCAN_MAX_FILE_MB = _env_int("SCAN_MAX_FILE_MB", 200)  # 0 = no limit
+SCAN_MAX_TOTAL_MB = _env_int("SCAN_MAX_TOTAL_MB", 0)  # Stop adding files past this much input; 0 = no limit
+
+# --- Extraction ---
+# Threads handle cheap text readers; processes handle OCR/PDF work.
+EXTRACTION_WORKERS = _env_int("EXTRACTION_WORKERS", min(32, (os.cpu_count() or 1) + 4))
+EXTRACTION_PROCESSES = _env_int("EXTRACTION_PROCESSES", max(1, (os.cpu_count() or 2) - 1))
+
+# PDFs are read in batches of pages; limits apply per document (0 = no limit)
+PDF_PAGES_PER_TASK = _env_int("PDF_PAGES_PER_TASK", 8)
+PDF_MAX_PAGES = _env_int("PDF_MAX_PAGES", 0)
+# Ceiling for a single decoded page image; larger images are downscaled before OCR
+PDF_IMAGE_MEMORY_MB = _env_int("PDF_IMAGE_MEMORY_MB", 64)
+# Adaptive OCR (0 OCRs every embedded image): pages whose text layer has this
+# many characters are not OCR'd, images smaller than the pixel threshold are
+# ignored, and mostly-image pages are rendered once at PDF_OCR_DPI
+PDF_OCR_ADAPTIVE = _env_int("PDF_OCR_ADAPTIVE", 1) != 0
+PDF_OCR_MIN_TEXT_CHARS = _env_int("PDF_OCR_MIN_TEXT_CHARS", 200)
+PDF_OCR_MIN_IMAGE_PX = _env_int("PDF_OCR_MIN_IMAGE_PX", 150)
+PDF_OCR_DPI = _env_int("PDF_OCR_DPI", 300)
+
+# Extracted text beyond this much RAM is spilled to a memory-mapped temp file (0 = keep it all in RAM)
+CONTENT_MEMORY_MB = _env_int("CONTENT_MEMORY_MB", 512)
+CONTENT_SPILL_DIR = os.getenv("CONTENT_SPILL_DIR") or None  # System temp folder by default
+
+# Exact copies of a file are merged into the newest one, and paragraphs
+# repeated across files, such as quoted email text, are sent once (0 disables).
+# Near-copies (at least DEDUP_SIMILARITY percent alike) are only merged with
+# DEDUP_NEAR=1: templated documents differing in a few fields look alike.
+DEDUP = _env_int("DEDUP", 1) != 0
+DEDUP_NEAR = _env_int("DEDUP_NEAR", 0) != 0
+DEDUP_SIMILARITY = _env_int("DEDUP_SIMILARITY", 90)
+DEDUP_PARAGRAPHS = _env_int("DEDUP_PARAGRAPHS", 1) != 0
+DEDUP_MIN_PARAGRAPH_CHARS = _env_int("DEDUP_MIN_PARAGRAPH_CHARS", 100)
+
+# Size budget for the on-disk extraction cache; 0 disables it
+EXTRACTION_CACHE_MB = _env_int("EXTRACTION_CACHE_MB", 512)
+EXTRACTION_CACHE_PATH = os.path.join(DATA_DIR, "extraction_cache.sqlite3")
+
+# --- OCR ---
+# Tesseract languages unless a job names its own; tesserocr, when installed,
+# keeps Tesseract loaded in each worker instead of starting it per image
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES") or "eng+hin"
+OCR_ENGINE = (os.getenv("OCR_ENGINE") or "auto").lower()  # auto, tesserocr or pytesseract
+# Images are converted to greyscale, downscaled past this size and binarized before OCR
+OCR_MAX_MEGAPIXELS = _env_int("OCR_MAX_MEGAPIXELS", 12)
+OCR_BINARIZE = _env_int("OCR_BINARIZE", 1) != 0
+# Recognized text by perceptual image hash, so repeated scans, letterheads
+# and stamps are read once; 0 disables it
+OCR_CACHE_MB = _env_int("OCR_CACHE_MB", 64)
+OCR_CACHE_PATH = os.path.join(DATA_DIR, "ocr_cache.sqlite3")
+
+# --- Gemini ---
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Endpoint for the raw HTTP path in api_handler; point it at a local stub for testing
+GEMINI_API_URL = os.getenv("GEMINI_API_URL") or "https://api.gemini.com/v1/ask"
+GEMINI_MAX_RETRIES = _env_int("GEMINI_MAX_RETRIES", 4)
+GEMINI_REQUESTS_PER_MINUTE = _env_int("GEMINI_REQUESTS_PER_MINUTE", 60)  # 0 = unlimited
+GEMINI_MAX_CONCURRENCY = _env_int("GEMINI_MAX_CONCURRENCY", 4)
+GEMINI_TIMEOUT_SECONDS = _env_int("GEMINI_TIMEOUT_SECONDS", 120)
+# "stub" selects the offline StubModel for testing without an API key
+GEMINI_MODEL = os.getenv("GEMINI_MODEL") or "gemini-1.5-flash"
+STUB_MODEL_LATENCY_MS = _env_int("STUB_MODEL_LATENCY_MS", 0)
+STUB_MODEL_URL = os.getenv("STUB_MODEL_URL") or None  # e.g. benchmarks/stub_server.py
+# Stream responses into the log as they are generated (set to 0 to disable)
+GEMINI_STREAMING = _env_int("GEMINI_STREAMING", 1) != 0
+
+# Memoized answers for repeated instructions; 0 MB disables the cache
+RESPONSE_CACHE_MB = _env_int("RESPONSE_CACHE_MB", 64)
+RESPONSE_CACHE_TTL_HOURS = _env_int("RESPONSE_CACHE_TTL_HOURS", 24 * 7)
+RESPONSE_CACHE_MEMORY_ENTRIES = _env_int("RESPONSE_CACHE_MEMORY_ENTRIES", 128)
+RESPONSE_CACHE_PATH = os.path.join(DATA_DIR, "response_cache.sqlite3")
+
+# --- Prompt planning ---
+# Content over the budget is condensed with a parallel map-reduce first
+PROMPT_TOKEN_BUDGET = _env_int("PROMPT_TOKEN_BUDGET", 200_000)
+PROMPT_CHUNK_TOKENS = _env_int("PROMPT_CHUNK_TOKENS", 30_000)
+MAP_REDUCE_CONCURRENCY = _env_int("MAP_REDUCE_CONCURRENCY", 4)
+
+# --- Conversation ---
+# Recent messages are kept verbatim; older ones are folded into a rolling summary
+CONVERSATION_WINDOW = _env_int("CONVERSATION_WINDOW", 10)
+CONVERSATION_CONTEXT_TOKENS = _env_int("CONVERSATION_CONTEXT_TOKENS", 2000)
+CONVERSATION_SUMMARY_TOKENS = _env_int("CONVERSATION_SUMMARY_TOKENS", 500)
+CONVERSATION_SUMMARY_BATCH = _env_int("CONVERSATION_SUMMARY_BATCH", 4)  # messages per summary update
+# Conversations are resumed after a restart (0 keeps them in memory only)
+CONVERSATION_PERSIST = _env_int("CONVERSATION_PERSIST", 1) != 0
+CONVERSATION_MAX_SESSIONS = _env_int("CONVERSATION_MAX_SESSIONS", 20)
+CONVERSATION_DB_PATH = os.path.join(DATA_DIR, "conversations.sqlite3")
+
+# --- Context caching ---
+# Files + persona are registered once as a cached context and follow-ups
+# reference it; Gemini only caches contexts above a minimum size
+CONTEXT_CACHE = _env_int("CONTEXT_CACHE", 1) != 0
+CONTEXT_CACHE_MIN_TOKENS = _env_int("CONTEXT_CACHE_MIN_TOKENS", 32_768)
+CONTEXT_CACHE_TTL_MINUTES = _env_int("CONTEXT_CACHE_TTL_MINUTES", 60)
+
+# --- Batch mode ---
+# "Ask Each File" runs the instruction per file; API calls are still capped by GEMINI_MAX_CONCURRENCY
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", 4)
+BATCH_MAX_ATTEMPTS = _env_int("BATCH_MAX_ATTEMPTS", 3)
+
+# --- Retrieval ---
+# Follow-up questions send only the top-k matching chunks (0 disables)
+RETRIEVAL_TOP_K = _env_int("RETRIEVAL_TOP_K", 8)
+RETRIEVAL_CHUNK_TOKENS = _env_int("RETRIEVAL_CHUNK_TOKENS", 600)
+
+# --- Jobs ---
+# Worker threads for reading, questions and indexing, and how many jobs may wait
+JOB_WORKERS = _env_int("JOB_WORKERS", 3)
+JOB_QUEUE_SIZE = _env_int("JOB_QUEUE_SIZE", 32)
+
+# --- Watch mode ---
+# Quiet period before a burst of file system events is re-extracted
+WATCH_DEBOUNCE_MS = _env_int("WATCH_DEBOUNCE_MS", 1000)
+
+# --- Startup ---
+# Handler libraries load on first use; warm-up imports them in the background
+# this long after the window opens (0 disables)
+WARM_UP_AFTER_MS = _env_int("WARM_UP_AFTER_MS", 1500)
+
+# Later launches (e.g. from the context menu) forward their paths to the running app
+SINGLE_INSTANCE = _env_int("SINGLE_INSTANCE", 1) != 0
+# Explorer starts one launch per selected file; paths arriving this close together are read as one
+FORWARD_BATCH_MS = _env_int("FORWARD_BATCH_MS", 500)
+
+# --- Metrics ---
+# Per-stage timing summary in the log after each run; traces are appended as JSONL when a path is set
+METRICS_SUMMARY = _env_int("METRICS_SUMMARY", 1) != 0
+METRICS_TRACE_PATH = os.getenv("METRICS_TRACE_PATH") or None
+
+# --- Log panel ---
+# The panel keeps the most recent lines; everything (including per-file lines) goes to the log file
+LOG_MAX_LINES = _env_int("LOG_MAX_LINES", 5000)
+LOG_MESSAGES_PER_TICK = _env_int("LOG_MESSAGES_PER_TICK", 2000)
+LOG_FILE_MB = _env_int("LOG_FILE_MB", 16)  # 0 disables the log file
+LOG_FILE_PATH = os.path.join(DATA_DIR, "copilot.log")
@@ -0,0 +1,249 @@
+import bisect
+import mmap
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+# Spill file space is mapped in blocks that are never unmapped while the
+# store is open, so views handed out stay valid as the file grows
+BLOCK_BYTES = 64 * 1024 * 1024
+READ_CHARS = 1024 * 1024  # Piece size when iterating spilled text
+
+class Segment:
+    __slots__ = ("text", "block", "offset", "length", "chars", "readers", "released")
+
+    def __init__(self, text: str):
+        self.text: Optional[str] = text  # None once spilled
+        self.block = -1
+        self.offset = 0
+        self.length = 0  # UTF-8 bytes on disk
+        self.chars = len(text)
+        self.readers = 0  # Streams reading the spilled bytes; its space is kept until they finish
+        self.released = False
+
+    @property
+    def spilled(self) -> bool:
+        return self.text is None
+
+@dataclass
+class ContentStats:
+    segments: int = 0
+    resident_bytes: int = 0
+    spilled_segments: int = 0
+    spilled_bytes: int = 0
+    limit_bytes: int = 0
+
+    def describe(self) -> str:
+        text = f"{self.resident_bytes / 1048576:.1f} MB in memory"
+        if self.spilled_segments:
+            text += f", {self.spilled_bytes / 1048576:.1f} MB spilled ({self.spilled_segments} files)"
+        return text
+
+# Holds extracted text per file under a RAM ceiling. Once the resident text
+# exceeds it, the least recently used segments are written as UTF-8 to an
+# anonymous temp file and read back through mmap, so a large folder costs
+# disk rather than memory. 0 means no ceiling. Space freed in the spill file
+# is reused by later spills.
+class ContentStore:
+    def __init__(self, limit_bytes: int = 0, spill_dir: Optional[str] = None):
+        self.limit_bytes = max(0, limit_bytes)
+        self.spill_dir = spill_dir
+        self._resident: "OrderedDict[int, Segment]" = OrderedDict()  # id -> segment, oldest first
+        self._resident_bytes = 0
+        self._spilled_segments = 0
+        self._spilled_bytes = 0
+        self._file = None
+        self._blocks: List[mmap.mmap] = []
+        self._block_used = 0
+        self._file_size = 0
+        self._free: List[Tuple[int, int, int]] = []  # (block, offset, length), in file order
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> Segment:
+        segment = Segment(text)
+        with self._lock:
+            self._resident[id(segment)] = segment
+            self._resident_bytes += sys.getsizeof(text)
+            self._enforce()
+        return segment
+
+    def release(self, segment: Segment):
+        # A released segment reads as empty; spill space still being
+        # streamed is freed when the last reader finishes
+        with self._lock:
+            if segment.released:
+                return
+            segment.released = True
+            if segment.spilled:
+                self._spilled_segments -= 1
+                self._spilled_bytes -= segment.length
+                if not segment.readers:
+                    self._free_extent(segment)
+            else:
+                if self._resident.pop(id(segment), None) is not None:
+                    self._resident_bytes -= sys.getsizeof(segment.text)
+                if not segment.readers:
+                    segment.text = ""
+
+    def pin(self, segment: Segment) -> bool:
+        # Keeps the segment readable until unpin(), even if it is released
+        # meanwhile; False if it is already released
+        with self._lock:
+            if segment.released:
+                return False
+            segment.readers += 1
+            return True
+
+    def unpin(self, segment: Segment):
+        with self._lock:
+            segment.readers -= 1
+            if segment.released and not segment.readers:
+                if segment.spilled:
+                    self._free_extent(segment)
+                else:
+                    segment.text = ""
+
+    def text(self, segment: Segment) -> str:
+        # Resident text is returned as is; spilled text is decoded from the
+        # map without being promoted back, so one full pass can't thrash
+        with self._lock:
+            if segment.released and not segment.readers:
+                return ""
+            if not segment.spilled:
+                if not segment.released:
+                    self._resident.move_to_end(id(segment), last=True)
+                return segment.text
+            return str(self._view(segment), "utf-8")
+
+    def iter_text(self, segment: Segment, piece_chars: int = READ_CHARS) -> Iterator[str]:
+        # Spilled text in bounded pieces, for consumers that stream
+        with self._lock:
+            if segment.released and not segment.readers:
+                return
+            if not segment.spilled:
+                text = segment.text
+                view = None
+            else:
+                segment.readers += 1
+                view = self._view(segment)
+        if view is None:
+            yield text
+            return
+        try:
+            step = max(4, piece_chars)
+            start = 0
+            while start < len(view):
+                end = min(len(view), start + step)
+                while end < len(view) and (view[end] & 0xC0) == 0x80:
+                    end += 1  # Don't split a multi-byte character
+                yield str(view[start:end], "utf-8")
+                start = end
+        finally:
+            view.release()
+            self.unpin(segment)
+
+    def stats(self) -> ContentStats:
+        with self._lock:
+            return ContentStats(
+                len(self._resident) + self._spilled_segments, self._resident_bytes,
+                self._spilled_segments, self._spilled_bytes, self.limit_bytes
+            )
+
+    def _view(self, segment: Segment) -> memoryview:
+        block = self._blocks[segment.block]
+        return memoryview(block)[segment.offset:segment.offset + segment.length]
+
+    def _enforce(self):
+        if not self.limit_bytes:
+            return
+        # Leave the newest segment resident; it is usually about to be read
+        while self._resident_bytes > self.limit_bytes and len(self._resident) > 1:
+            _, segment = self._resident.popitem(last=False)
+            self._resident_bytes -= sys.getsizeof(segment.text)
+            self._spill(segment)
+
+    def _spill(self, segment: Segment):
+        data = segment.text.encode("utf-8")
+        segment.block, segment.offset = self._allocate(len(data))
+        block = self._blocks[segment.block]
+        block[segment.offset:segment.offset + len(data)] = data
+        segment.length = len(data)
+        segment.text = None
+        self._spilled_segments += 1
+        self._spilled_bytes += len(data)
+
+    def _allocate(self, size: int) -> Tuple[int, int]:
+        # First fit among freed extents, else the end of the last block
+        if size:
+            for i, (block, offset, length) in enumerate(self._free):
+                if length >= size:
+                    if length == size:
+                        del self._free[i]
+                    else:
+                        self._free[i] = (block, offset + size, length - size)
+                    return block, offset
+        if not self._blocks or self._block_used + size > len(self._blocks[-1]):
+            self._new_block(size)
+        offset = self._block_used
+        self._block_used += size
+        return len(self._blocks) - 1, offset
+
+    def _free_extent(self, segment: Segment):
+        if segment.length:
+            self._add_free(segment.block, segment.offset, segment.length)
+        segment.block = -1
+        segment.length = 0
+
+    def _add_free(self, block: int, offset: int, length: int):
+        # Kept sorted so neighbouring extents merge into one
+        i = bisect.bisect(self._free, (block, offset, length))
+        if i < len(self._free):
+            after = self._free[i]
+            if after[0] == block and after[1] == offset + length:
+                length += after[2]
+                del self._free[i]
+        if i:
+            before = self._free[i - 1]
+            if before[0] == block and before[1] + before[2] == offset:
+                self._free[i - 1] = (block, before[1], before[2] + length)
+                return
+        self._free.insert(i, (block, offset, length))
+
+    def _new_block(self, min_bytes: int):
+        if self._file is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self._file = tempfile.TemporaryFile(prefix="content-", suffix=".spill", dir=self.spill_dir)
+        if self._blocks and self._block_used < len(self._blocks[-1]):
+            # The unused tail of the last block stays available for smaller spills
+            self._add_free(len(self._blocks) - 1, self._block_used, len(self._blocks[-1]) - self._block_used)
+        # Map offsets must be multiples of the allocation granularity
+        granularity = mmap.ALLOCATIONGRANULARITY
+        size = max(BLOCK_BYTES, -(-max(1, min_bytes) // granularity) * granularity)
+        self._file.truncate(self._file_size + size)
+        self._blocks.append(mmap.mmap(self._file.fileno(), size, offset=self._file_size))
+        self._file_size += size
+        self._block_used = 0
+
+    def close(self):
+        with self._lock:
+            for block in self._blocks:
+                try:
+                    block.close()
+                except BufferError:
+                    pass  # A view is still alive; the map goes with it
+            self._blocks = []
+            self._free = []
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,143 @@
+import hashlib
+import itertools
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional, Tuple
+
+import lazy_modules
+from prompt_planner import estimate_tokens
+
+@dataclass
+class CachedContext:
+    name: str  # Provider handle, e.g. "cachedContents/abc123"
+    key: str  # Fingerprint of model + system instruction + content
+    model: object  # Model bound to the cached context
+    tokens: int
+    expires_at: float
+
+@dataclass
+class ContextCacheStats:
+    creates: int = 0
+    reuses: int = 0
+
+# Context caching only accepts explicitly versioned models; the usual
+# unversioned aliases are mapped to the stable version they point at
+PINNED_MODELS = {
+    "gemini-1.5-flash": "gemini-1.5-flash-001",
+    "gemini-1.5-pro": "gemini-1.5-pro-001",
+}
+_VERSIONED_MODEL_RE = re.compile(r"-\d{3}$")
+
+def caching_model(model_name: str) -> str:
+    # The versioned name to cache contexts with; ValueError if there is none
+    name = model_name[len("models/"):] if model_name.startswith("models/") else model_name
+    name = PINNED_MODELS.get(name, name)
+    if not _VERSIONED_MODEL_RE.search(name):
+        raise ValueError(f"context caching needs a versioned model such as gemini-1.5-flash-001, "
+                         f"not {model_name}; set GEMINI_MODEL to one")
+    return name
+
+# Registers the context with Gemini's context caching, so later requests
+# send only the new instruction and are billed for the cached tokens at the
+# reduced rate. Caching needs a pinned model version and a minimum size.
+class GeminiContextBackend:
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+
+    def create(self, model_name: str, system_instruction: str, content: str,
+               ttl_seconds: float) -> Tuple[str, object]:
+        genai = lazy_modules.load("google.generativeai")
+        caching = lazy_modules.load("google.generativeai.caching")
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+        if not model_name.startswith("models/"):
+            model_name = f"models/{model_name}"
+        cached = caching.CachedContent.create(
+            model=model_name, system_instruction=system_instruction,
+            contents=[content], ttl=timedelta(seconds=ttl_seconds)
+        )
+        return cached.name, genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+    def delete(self, name: str):
+        caching = lazy_modules.load("google.generativeai.caching")
+        caching.CachedContent.get(name).delete()
+
+class _PrefixedModel:
+    def __init__(self, model, prefix: str):
+        self.model = model
+        self.prefix = prefix
+
+    def generate_content(self, prompt, **kwargs):
+        return self.model.generate_content(f"{self.prefix}{prompt}", **kwargs)
+
+# Local stand-in for the stub model and offline runs: the "cached" prefix is
+# kept in memory and prepended to each prompt, so handles and invalidation
+# behave as with the provider even though nothing is saved on tokens.
+class LocalContextBackend:
+    def __init__(self, model_factory: Callable[[str], object]):
+        self.model_factory = model_factory
+        self._ids = itertools.count(1)
+        self.live = set()
+
+    def create(self, model_name: str, system_instruction: str, content: str,
+               ttl_seconds: float) -> Tuple[str, object]:
+        name = f"local/{next(self._ids)}"
+        self.live.add(name)
+        return name, _PrefixedModel(self.model_factory(model_name), f"{system_instruction}\n\n{content}\n\n")
+
+    def delete(self, name: str):
+        self.live.discard(name)
+
+# Keeps one cached context for the current corpus and persona. A different
+# fingerprint (files changed, persona switched) or an expired TTL replaces
+# it; the old handle is deleted so it stops accruing storage.
+class ContextCache:
+    def __init__(self, backend, model_name: str, min_tokens: int, ttl_seconds: float):
+        self.backend = backend
+        self.model_name = model_name
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        self.stats = ContextCacheStats()
+        self.current: Optional[CachedContext] = None
+        self._lock = threading.Lock()
+
+    def get(self, system_instruction: str, render: Callable[[], str], content_tokens: int,
+            fingerprint: str) -> Optional[CachedContext]:
+        # Returns None when the context is too small to be worth caching. The
+        # content is only rendered when a new context has to be created.
+        tokens = estimate_tokens(system_instruction) + content_tokens
+        if tokens < self.min_tokens:
+            return None
+        digest = hashlib.sha256()
+        for part in (self.model_name, system_instruction, fingerprint):
+            digest.update(part.encode('utf-8', errors='ignore'))
+            digest.update(b"\x1f")
+        key = digest.hexdigest()
+
+        with self._lock:
+            now = time.time()
+            # A margin keeps a request from landing just as the handle expires
+            if self.current and self.current.key == key and self.current.expires_at - 60 > now:
+                self.stats.reuses += 1
+                return self.current
+            self._drop()
+            name, model = self.backend.create(self.model_name, system_instruction, render(), self.ttl_seconds)
+            self.current = CachedContext(name, key, model, tokens, now + self.ttl_seconds)
+            self.stats.creates += 1
+            return self.current
+
+    def _drop(self):
+        if self.current is None:
+            return
+        name, self.current = self.current.name, None
+        try:
+            self.backend.delete(name)
+        except Exception as e:
+            print(f"Could not delete cached context {name}: {e}")  # It still expires on its own
+
+    def invalidate(self):
+        with self._lock:
+            self._drop()
@@ -0,0 +1,126 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Deque, List, Optional
+
+from prompt_planner import estimate_tokens
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant "
+    "about some documents. Update the summary with the new messages below. Keep the facts, "
+    "decisions, names and open questions a follow-up question might depend on; drop "
+    "pleasantries and repetition. Stay under {words} words.\n\n"
+    "--- CURRENT SUMMARY ---\n{summary}\n\n"
+    "--- NEW MESSAGES ---\n{messages}\n\n"
+    "--- UPDATED SUMMARY ---\n"
+)
+
+@dataclass
+class ChatMessage:
+    role: str  # 'user' or 'assistant'
+    content: str
+    timestamp: datetime
+    id: Optional[int] = None  # Row id when persisted
+
+def _clip(text: str, tokens: int) -> str:
+    limit = max(0, tokens) * 4  # Same 4 chars/token estimate as the planner
+    return text if len(text) <= limit else text[:limit].rstrip() + " [...]"
+
+# Recent messages are kept verbatim in a bounded window; older ones are
+# folded into a rolling model-written summary, so the context sent with each
+# question stays within a fixed budget however long the session runs. With a
+# store, messages and the summary survive restarts.
+class ConversationManager:
+    def __init__(self, store=None, max_history: int = 10, context_tokens: int = 2000,
+                 summary_tokens: int = 500, summary_batch: int = 4):
+        self.store = store
+        self.max_history = max(1, max_history)
+        self.context_tokens = context_tokens
+        self.summary_tokens = summary_tokens
+        self.summary_batch = max(1, summary_batch)
+        self.history: Deque[ChatMessage] = deque()
+        self.summary = ""
+        self._pending: List[ChatMessage] = []  # Left the window, not yet summarized
+        self._session_id: Optional[int] = None
+        self._generation = 0  # Bumped by clear() so a late summary is discarded
+        self._lock = threading.Lock()
+        if store is not None:
+            self._resume()
+
+    def _resume(self):
+        latest = self.store.latest_session()
+        if latest is None:
+            return
+        self._session_id, self.summary, summarized_upto = latest
+        for message_id, role, content, timestamp in self.store.messages_after(self._session_id, summarized_upto):
+            self._append(ChatMessage(role, content, datetime.fromtimestamp(timestamp), message_id))
+
+    def _append(self, message: ChatMessage):
+        self.history.append(message)
+        while len(self.history) > self.max_history:
+            self._pending.append(self.history.popleft())
+
+    def add_message(self, role: str, content: str):
+        message = ChatMessage(role=role, content=content, timestamp=datetime.now())
+        with self._lock:
+            if self.store is not None:
+                if self._session_id is None:
+                    self._session_id = self.store.new_session()
+                message.id = self.store.add_message(self._session_id, role, content, message.timestamp.timestamp())
+            self._append(message)
+
+    def get_context(self) -> str:
+        # The summary plus as many of the newest messages as fit the budget;
+        # a long answer is clipped rather than crowding out everything else
+        with self._lock:
+            summary = self.summary
+            recent = list(self.history)
+        if not summary and not recent:
+            return ""
+
+        budget = self.context_tokens
+        lines = []
+        for msg in reversed(recent):
+            if budget <= 0:
+                break
+            text = _clip(msg.content, budget)
+            budget -= estimate_tokens(text)
+            lines.append(f"{msg.role}: {text}\n")
+        context = f"Summary of earlier conversation:\n{summary}\n\n" if summary else ""
+        return context + "Previous conversation:\n" + "".join(reversed(lines))
+
+    def needs_summary(self) -> bool:
+        return len(self._pending) >= self.summary_batch
+
+    def summarize(self, generate: Callable[[str], str]):
+        # Folds the messages that left the window into the summary with one
+        # model call; safe to skip or retry, nothing is dropped until it succeeds
+        with self._lock:
+            pending = list(self._pending)
+            summary = self.summary
+            session_id = self._session_id
+            generation = self._generation
+        if not pending:
+            return
+        messages = "\n".join(f"{m.role}: {_clip(m.content, self.summary_tokens * 2)}" for m in pending)
+        prompt = SUMMARY_PROMPT.format(
+            words=max(50, self.summary_tokens * 3 // 4), summary=summary or "(none yet)", messages=messages
+        )
+        new_summary = _clip(generate(prompt).strip(), self.summary_tokens)
+        with self._lock:
+            if generation != self._generation:
+                return  # Cleared while the summary was being written
+            self.summary = new_summary
+            del self._pending[:len(pending)]
+            if self.store is not None and pending[-1].id is not None:
+                self.store.save_summary(session_id, new_summary, pending[-1].id)
+
+    def clear(self):
+        # Starts a new session; the old one stays in the store until pruned
+        with self._lock:
+            self.history.clear()
+            self._pending.clear()
+            self.summary = ""
+            self._session_id = None
+            self._generation += 1
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# Persists conversations so a restart resumes where the user left off. Each
+# "Clear" starts a new session; only the most recent sessions are kept.
+class ConversationStore:
+    def __init__(self, db_path: str, max_sessions: int = 20):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, started REAL NOT NULL, updated REAL NOT NULL,"
+            " summary TEXT NOT NULL DEFAULT '', summarized_upto INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER NOT NULL,"
+            " role TEXT NOT NULL, content TEXT NOT NULL, timestamp REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self._conn.commit()
+
+    def latest_session(self) -> Optional[Tuple[int, str, int]]:
+        # (session_id, summary, summarized_upto) of the most recent session
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, summary, summarized_upto FROM sessions ORDER BY updated DESC, id DESC LIMIT 1"
+            ).fetchone()
+
+    def new_session(self) -> int:
+        now = time.time()
+        with self._lock:
+            session_id = self._conn.execute(
+                "INSERT INTO sessions (started, updated) VALUES (?, ?)", (now, now)
+            ).lastrowid
+            self._prune()
+            self._conn.commit()
+        return session_id
+
+    def messages_after(self, session_id: int, after_id: int) -> List[Tuple[int, str, str, float]]:
+        # (id, role, content, timestamp) oldest first
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, role, content, timestamp FROM messages WHERE session_id = ? AND id > ? ORDER BY id",
+                (session_id, after_id)
+            ).fetchall()
+
+    def add_message(self, session_id: int, role: str, content: str, timestamp: float) -> int:
+        with self._lock:
+            message_id = self._conn.execute(
+                "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, timestamp)
+            ).lastrowid
+            self._conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (timestamp, session_id))
+            self._conn.commit()
+        return message_id
+
+    def save_summary(self, session_id: int, summary: str, summarized_upto: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, summarized_upto = ? WHERE id = ?",
+                (summary, summarized_upto, session_id)
+            )
+            self._conn.commit()
+
+    def _prune(self):
+        stale = [row[0] for row in self._conn.execute(
+            "SELECT id FROM sessions ORDER BY updated DESC, id DESC LIMIT -1 OFFSET ?", (max(1, self.max_sessions),)
+        ).fetchall()]
+        for session_id in stale:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
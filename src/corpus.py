@@ -0,0 +1,165 @@
+import os
+import threading
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from content_store import ContentStats, ContentStore, Segment
+
+@dataclass
+class Document:
+    path: str
+    filename: str
+    segment: Segment
+    blank: bool  # Only whitespace
+
+    @property
+    def header(self) -> str:
+        return f"--- Content of {self.filename} ---\n"
+
+# Processed file content kept per file, so a single changed file can be
+# patched without re-reading or re-joining everything else. Text lives in a
+# ContentStore that spills cold files to disk past its RAM ceiling; prompt
+# builders stream it with iter_render() instead of holding one big string.
+class Corpus:
+    def __init__(self, root: str = "", store: Optional[ContentStore] = None, labelled: Optional[bool] = None):
+        self.root = root
+        self.is_folder = bool(root) and os.path.isdir(root)
+        # Each document gets a "Content of" header when there can be several:
+        # a folder, or several paths read together
+        self.labelled = self.is_folder if labelled is None else labelled
+        self.filenames: List[str] = []  # Display names, in document order
+        self.version = 0  # Bumped on every change; lets async work detect staleness
+        self.store = store or ContentStore()
+        self.ocr_languages: Optional[str] = None  # Set when the files were read with non-default OCR languages
+        # Filled by deduplication: kept display name -> names of the exact
+        # copies, and of the near-copies, merged into it
+        self.merged: Dict[str, List[str]] = {}
+        self.near_merged: Dict[str, List[str]] = {}
+        self.dedup_saved = 0  # UTF-8 bytes not sent thanks to deduplication
+        self._documents: Dict[str, Document] = {}  # path -> document, in insertion order
+        self._fingerprint: Optional[str] = None
+        # Patches arrive on the UI thread while prompt builders read from workers
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.normcase(path) in self._documents
+
+    def _changed(self):
+        self.version += 1
+        self._fingerprint = None
+
+    def upsert(self, path: str, text: str) -> bool:
+        key = os.path.normcase(path)
+        with self._lock:
+            existing = self._documents.get(key)
+            if existing is not None:
+                if existing.segment.chars == len(text) and self.store.text(existing.segment) == text:
+                    return False
+                self.store.release(existing.segment)
+                existing.segment = self.store.put(text)
+                existing.blank = not text.strip()
+            else:
+                document = Document(path, os.path.basename(path), self.store.put(text), not text.strip())
+                self._documents[key] = document
+                self.filenames.append(document.filename)
+            self._changed()
+            return True
+
+    def remove(self, path: str) -> List[str]:
+        # Removing a directory drops every document beneath it
+        key = os.path.normcase(path)
+        prefix = key.rstrip(os.sep) + os.sep
+        with self._lock:
+            removed = [k for k in self._documents if k == key or k.startswith(prefix)]
+            for k in removed:
+                self.store.release(self._documents.pop(k).segment)
+            if removed:
+                # Updated in place so anything holding the list sees the change
+                self.filenames[:] = [d.filename for d in self._documents.values()]
+                self._changed()
+            return removed
+
+    def reorder(self, paths: Sequence[str]):
+        # Documents added in completion order are put back in walk order
+        with self._lock:
+            order = {os.path.normcase(p): i for i, p in enumerate(paths)}
+            items = sorted(self._documents.items(), key=lambda item: order.get(item[0], len(order)))
+            self._documents = dict(items)
+            self.filenames[:] = [d.filename for d in self._documents.values()]
+            self._changed()
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return [d.path for d in self._documents.values()]
+
+    def text(self, path: str) -> str:
+        with self._lock:
+            return self.store.text(self._documents[os.path.normcase(path)].segment)
+
+    def iter_documents(self) -> Iterator[Tuple[str, str]]:
+        # One file's text at a time; spilled files are read back as needed.
+        # Files removed since the iteration started are skipped.
+        with self._lock:
+            documents = list(self._documents.values())
+        for d in documents:
+            with self._lock:
+                if d.segment.released:
+                    continue
+                text = self.store.text(d.segment)
+            yield d.filename, text
+
+    def total_chars(self) -> int:
+        with self._lock:
+            return sum(d.segment.chars for d in self._documents.values())
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return all(d.blank for d in self._documents.values())
+
+    def iter_render(self) -> Iterator[str]:
+        # The prompt content in pieces, ready for "".join() into the final prompt
+        with self._lock:
+            documents = list(self._documents.values())
+        for d in documents:
+            # The pin keeps a file removed mid-render readable until it is written out
+            with self._lock:
+                segment = d.segment
+                if not self.store.pin(segment):
+                    continue
+            try:
+                if self.labelled:
+                    yield d.header
+                yield from self.store.iter_text(segment)
+                if self.labelled:
+                    yield "\n\n"
+            finally:
+                self.store.unpin(segment)
+
+    def rendered_chars(self) -> int:
+        with self._lock:
+            if not self.labelled:
+                return self.total_chars()
+            return sum(len(d.header) + d.segment.chars + 2 for d in self._documents.values())
+
+    def render(self) -> str:
+        return "".join(self.iter_render())
+
+    def fingerprint(self) -> str:
+        # Identifies the rendered content without building it
+        with self._lock:
+            if self._fingerprint is None:
+                digest = hashlib.sha256()
+                for piece in self.iter_render():
+                    digest.update(piece.encode("utf-8", errors="ignore"))
+                self._fingerprint = digest.hexdigest()
+            return self._fingerprint
+
+    def memory_stats(self) -> ContentStats:
+        return self.store.stats()
+
+    def close(self):
+        self.store.close()
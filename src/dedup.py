@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+# Paragraphs are separated by blank lines, including quoted ones ("> ")
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n(?:[ \t>]*\n)+")
+_QUOTE_PREFIX_RE = re.compile(r"^[ \t>]+", re.MULTILINE)
+_SHINGLE_CHUNK = 16384  # Shingles hashed per step, bounding the permutation matrix
+# Long files keep a hash-selected sample of their shingles (every 2nd, 4th,
+# ...); similar files are similar in length and so are sampled alike
+_MAX_SHINGLES = 65536
+
+@dataclass
+class DedupReport:
+    files: int = 0
+    exact: int = 0  # Files dropped as byte-for-byte (whitespace-insensitive) copies
+    near: int = 0  # Files dropped as near-copies of a kept file
+    paragraphs: int = 0  # Repeated paragraphs removed from kept files
+    bytes_before: int = 0
+    bytes_saved: int = 0
+    merged: Dict[str, List[str]] = field(default_factory=dict)  # Kept path -> exact copies merged into it
+    near_merged: Dict[str, List[str]] = field(default_factory=dict)  # Kept path -> near-copies merged into it
+
+    def describe(self) -> str:
+        share = self.bytes_saved / self.bytes_before if self.bytes_before else 0.0
+        return (f"{self.exact} exact and {self.near} near-duplicate files merged, "
+                f"{self.paragraphs} repeated paragraphs dropped; "
+                f"{self.bytes_saved / 1048576:.1f} MB ({share:.0%}) less to send")
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8", errors="ignore"))
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+# Drops repeated content from a freshly read corpus before it is prompted:
+# exact copies by hash, and paragraphs already present in another file,
+# which is mostly quoted email text. Near-copies (v2, final, final_FINAL)
+# found by MinHash over word shingles with LSH banding are only merged when
+# near_merge is set: templated documents such as invoices look alike while
+# differing in the fields that matter. Without it they lose just their
+# shared paragraphs. Newer files are kept, so the latest version of a
+# document is the one that is sent.
+class Deduplicator:
+    def __init__(self, near_threshold: float = 0.9, num_perm: int = 128, bands: int = 32,
+                 shingle_words: int = 5, min_paragraph_chars: int = 100, paragraphs: bool = True,
+                 near_merge: bool = False):
+        self.near_threshold = near_threshold
+        self.near_merge = near_merge
+        self.bands = max(1, min(bands, num_perm))
+        self.rows = max(1, num_perm // self.bands)
+        self.num_perm = self.bands * self.rows
+        self.shingle_words = max(1, shingle_words)
+        self.min_paragraph_chars = min_paragraph_chars
+        self.paragraphs = paragraphs
+        rng = np.random.default_rng(1)
+        # Multiply-shift hashing; odd multipliers keep each permutation a bijection
+        self._a = rng.integers(1, 2 ** 63, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return None
+        hashes = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+        # Rolling combination of k consecutive word hashes = one shingle hash
+        k = min(self.shingle_words, len(hashes))
+        shingles = hashes[:len(hashes) - k + 1].copy()
+        for offset in range(1, k):
+            shingles *= np.uint64(1099511628211)
+            shingles ^= hashes[offset:len(hashes) - k + 1 + offset]
+        stride = 1
+        while len(shingles) // stride > _MAX_SHINGLES:
+            stride *= 2
+        if stride > 1:
+            shingles = shingles[(shingles & np.uint64(stride - 1)) == 0]
+        shingles = np.unique(shingles)
+        signature = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(shingles), _SHINGLE_CHUNK):
+            chunk = shingles[start:start + _SHINGLE_CHUNK]
+            values = self._a[:, None] * chunk[None, :] + self._b[:, None]
+            np.minimum(signature, values.min(axis=1), out=signature)
+        return signature
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    @staticmethod
+    def _paragraph_key(paragraph: str) -> int:
+        return hash(" ".join(_QUOTE_PREFIX_RE.sub("", paragraph).split()))
+
+    def run(self, corpus) -> DedupReport:
+        report = DedupReport()
+        exact: Dict[bytes, str] = {}
+        buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        signatures: Dict[str, np.ndarray] = {}
+        owners: Dict[int, str] = {}  # Paragraph key -> path of the file that keeps it
+
+        def merge(path: str, into: str, size: int, merged: Dict[str, List[str]]):
+            corpus.remove(path)
+            merged.setdefault(into, []).append(path)
+            report.bytes_saved += size
+
+        for path in sorted(corpus.paths(), key=_mtime, reverse=True):
+            text = corpus.text(path)
+            size = _utf8_len(text)
+            report.files += 1
+            report.bytes_before += size
+
+            digest = hashlib.sha1(" ".join(text.split()).encode("utf-8", errors="ignore")).digest()
+            if digest in exact:
+                report.exact += 1
+                merge(path, exact[digest], size, report.merged)
+                continue
+
+            signature = self.signature(text) if self.near_merge else None
+            if signature is not None:
+                match = None
+                for key in self._bands(signature):
+                    for other in buckets.get(key, ()):
+                        if float(np.mean(signatures[other] == signature)) >= self.near_threshold:
+                            match = other
+                            break
+                    if match:
+                        break
+                if match:
+                    report.near += 1
+                    merge(path, match, size, report.near_merged)
+                    continue
+
+            if self.paragraphs:
+                kept, dropped_from = self._drop_paragraphs(text, owners)
+                if dropped_from and not kept.strip():
+                    # Nothing new: every paragraph is already in other files
+                    report.paragraphs += sum(dropped_from.values())
+                    merge(path, dropped_from.most_common(1)[0][0], size, report.merged)
+                    continue
+                if dropped_from:
+                    report.paragraphs += sum(dropped_from.values())
+                    report.bytes_saved += size - _utf8_len(kept)
+                    corpus.upsert(path, kept)
+                    text = kept
+                for paragraph in _PARAGRAPH_SPLIT_RE.split(text):
+                    if len(paragraph) >= self.min_paragraph_chars:
+                        owners.setdefault(self._paragraph_key(paragraph), path)
+
+            exact[digest] = path
+            if signature is not None:
+                signatures[path] = signature
+                for key in self._bands(signature):
+                    buckets.setdefault(key, []).append(path)
+        return report
+
+    def _drop_paragraphs(self, text: str, owners: Dict[int, str]) -> Tuple[str, Counter]:
+        # Returns the text without paragraphs another file already holds, and
+        # how many were dropped per owning file. A run of dropped paragraphs
+        # leaves a one-line pointer so the reader knows something was there.
+        kept, dropped_from = [], Counter()
+        last_owner = None
+        for paragraph in _PARAGRAPH_SPLIT_RE.split(text):
+            owner = None
+            if len(paragraph) >= self.min_paragraph_chars:
+                owner = owners.get(self._paragraph_key(paragraph))
+            if owner is None:
+                kept.append(paragraph)
+                last_owner = None
+                continue
+            dropped_from[owner] += 1
+            if owner != last_owner:
+                kept.append(f"[Repeated text from {os.path.basename(owner)} omitted]")
+                last_owner = owner
+        if not dropped_from:
+            return text, dropped_from
+        if all(p.startswith("[Repeated text from ") for p in kept):
+            return "", dropped_from
+        return "\n\n".join(kept), dropped_from
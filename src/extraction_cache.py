@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+PRUNE_EVERY = 64  # Puts between sweeps of the files table
+PRUNE_BATCH = 256  # Remembered paths checked per sweep
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+    total_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# On-disk cache of extracted text, stored in SQLite.
+#
+# Entries are keyed by (content hash, handler version) so renamed or copied
+# files still hit. A second table remembers the (size, mtime) each path had
+# when it was last hashed, which lets unchanged files skip hashing entirely.
+# Hashing runs outside the lock, so lookups from several threads overlap.
+class ExtractionCache:
+    def __init__(self, db_path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._prune_after = 0  # files rowid the next sweep starts after
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " content_hash TEXT NOT NULL, handler_version TEXT NOT NULL,"
+            " data BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL,"
+            " metadata TEXT NOT NULL DEFAULT '{}',"
+            " PRIMARY KEY (content_hash, handler_version))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")}
+        if "metadata" not in columns:
+            self._conn.execute("ALTER TABLE extractions ADD COLUMN metadata TEXT NOT NULL DEFAULT '{}'")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extractions_last_access ON extractions (last_access)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " content_hash TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+        ).fetchone()
+        self.stats.entries, self.stats.total_bytes = count, total
+
+    def _content_hash(self, path: str) -> Tuple[str, os.stat_result]:
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, st.st_size, st.st_mtime_ns)
+            ).fetchone()
+        if row:
+            return row[0], st
+        content_hash = hash_file(path)
+        with self._lock:
+            self._remember(path, st, content_hash)
+            self._conn.commit()
+        return content_hash, st
+
+    def _remember(self, path: str, st: os.stat_result, content_hash: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, content_hash)
+        )
+
+    def get(self, path: str, handler_version: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        try:
+            content_hash, _ = self._content_hash(path)
+        except OSError:
+            with self._lock:
+                self.stats.misses += 1
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, metadata FROM extractions WHERE content_hash = ? AND handler_version = ?",
+                (content_hash, handler_version)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE extractions SET last_access = ? WHERE content_hash = ? AND handler_version = ?",
+                (time.time(), content_hash, handler_version)
+            )
+            self._conn.commit()
+            self.stats.hits += 1
+        return zlib.decompress(row[0]).decode('utf-8'), json.loads(row[1])
+
+    def put(self, path: str, handler_version: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        data = zlib.compress(text.encode('utf-8'))
+        if len(data) > self.max_bytes:
+            return
+        try:
+            content_hash, st = self._content_hash(path)
+        except OSError:
+            return
+        with self._lock:
+            # Recorded again: a sweep may have dropped the row since the
+            # lookup, while no extraction referred to its content yet
+            self._remember(path, st, content_hash)
+            old = self._conn.execute(
+                "SELECT size FROM extractions WHERE content_hash = ? AND handler_version = ?",
+                (content_hash, handler_version)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (content_hash, handler_version, data, size, last_access, metadata)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, handler_version, data, len(data), time.time(), json.dumps(metadata or {}, default=str))
+            )
+            if old:
+                self.stats.total_bytes -= old[0]
+            else:
+                self.stats.entries += 1
+            self.stats.total_bytes += len(data)
+            self._evict()
+            self._conn.commit()
+            self._puts += 1
+            sweep = self._puts % PRUNE_EVERY == 0
+        if sweep:
+            self._prune_files()
+
+    def _evict(self):
+        # Least-recently-used entries go first until we're back under budget
+        evicted = False
+        while self.stats.total_bytes > self.max_bytes and self.stats.entries:
+            rows = self._conn.execute(
+                "SELECT content_hash, handler_version, size FROM extractions"
+                " ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            for content_hash, handler_version, size in rows:
+                if self.stats.total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM extractions WHERE content_hash = ? AND handler_version = ?",
+                    (content_hash, handler_version)
+                )
+                self.stats.entries -= 1
+                self.stats.total_bytes -= size
+                evicted = True
+        if evicted:
+            self._drop_orphaned_files()
+
+    def _drop_orphaned_files(self):
+        # Paths are only worth remembering while some extraction of their content is cached
+        self._conn.execute(
+            "DELETE FROM files WHERE content_hash NOT IN (SELECT content_hash FROM extractions)"
+        )
+
+    def _prune_files(self):
+        # Walks the remembered paths a batch at a time and forgets deleted or
+        # moved ones; the existence checks run outside the lock
+        with self._lock:
+            self._drop_orphaned_files()
+            rows = self._conn.execute(
+                "SELECT rowid, path FROM files WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (self._prune_after, PRUNE_BATCH)
+            ).fetchall()
+            self._conn.commit()
+        self._prune_after = rows[-1][0] if len(rows) == PRUNE_BATCH else 0
+        missing = [(rowid,) for rowid, path in rows if not os.path.exists(path)]
+        if missing:
+            with self._lock:
+                self._conn.executemany("DELETE FROM files WHERE rowid = ?", missing)
+                self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import ocr_service
+
+@dataclass
+class FileResult:
+    index: int  # Position in the walk order, used to keep output deterministic
+    path: str
+    filename: str
+    content: str = ""
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.content.strip())
+
+def _timed_call(fn, ocr_languages, *args):
+    # Runs in the worker, so the duration excludes time spent queued
+    started = time.perf_counter()
+    with ocr_service.job_languages(ocr_languages):
+        value = fn(*args)
+    return value, time.perf_counter() - started
+
+# Runs file handlers on a thread pool, or on a process pool for CPU-bound ones
+@dataclass
+class _PendingFile:
+    result: FileResult
+    parts: List[Optional[str]]
+    remaining: int
+    paged: bool = False
+    pages_total: int = 0
+    pages_done: int = 0
+    handler: str = ""
+
+class ExtractionEngine:
+    def __init__(self, registry, max_workers: int = 4, max_processes: int = 1,
+                 cache=None, pages_per_task: int = 8, metrics=None):
+        self.registry = registry
+        self.metrics = metrics
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = cache
+        self.max_workers = max(1, max_workers)
+        self.max_processes = max(0, max_processes)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_processes == 0:
+            return None
+        with self._lock:
+            # Process start-up is expensive (especially on Windows), so the
+            # pool is created on first use and kept for later runs.
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_processes)
+            return self._process_pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+
+    def _prepare(self, path, handler, version):
+        # Runs on a worker, so neither the cache lookup (which hashes a new
+        # or changed file) nor the page count (which opens the document)
+        # holds up dispatch. Returns (cached, page_count, size).
+        if self.cache is not None:
+            cached = self.cache.get(path, version)
+            if cached is not None:
+                return cached, 0, 0
+        if not (handler.count_pages and handler.read_pages):
+            return None, 0, 0
+        try:
+            page_count = handler.count_pages(path)
+            if page_count > self.pages_per_task:
+                return None, page_count, os.path.getsize(path)
+        except Exception:
+            pass  # Let the full handler report the error
+        return None, 0, 0
+
+    def _submit(self, futures, pool, pending, handler, path, ocr_languages, page_count, size):
+        if page_count <= self.pages_per_task:
+            pending.parts = [None]
+            pending.remaining = 1
+            futures[pool.submit(_timed_call, handler.read, ocr_languages, path)] = (pending, 0, 0)
+            return
+        # Split into page ranges so one long document is spread across workers
+        starts = range(1, page_count + 1, self.pages_per_task)
+        pending.parts = [None] * len(starts)
+        pending.remaining = len(starts)
+        pending.paged = True
+        pending.pages_total = page_count
+        pending.result.metadata = {"bytes": size, "pages": page_count}
+        for batch, first in enumerate(starts):
+            last = min(first + self.pages_per_task - 1, page_count)
+            futures[pool.submit(_timed_call, handler.read_pages, ocr_languages, path, first, last)] = (
+                pending, batch, last - first + 1
+            )
+
+    def _dispatch(self, futures, threads, pending, handler, path, ocr_languages, page_count, size):
+        pool = threads
+        if handler.cpu_bound:
+            pool = self._get_process_pool() or threads
+        self._submit(futures, pool, pending, handler, path, ocr_languages, page_count, size)
+
+    def run(self, paths: List[str],
+            on_result: Optional[Callable[[FileResult, int, int], None]] = None,
+            on_pages: Optional[Callable[[FileResult, int, int], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+            ocr_languages: Optional[str] = None) -> List[FileResult]:
+        # on_result(result, done, total) fires in completion order; the
+        # returned list is always in the order of `paths`. on_pages(result,
+        # pages_done, pages_total) reports progress within paged documents.
+        # Once should_stop() is true, work that hasn't started is cancelled
+        # and only the files finished so far are returned. ocr_languages
+        # (e.g. "eng+deu") overrides OCR_LANGUAGES for this run.
+        total = len(paths)
+        results: List[FileResult] = []
+        if total == 0:
+            return results
+
+        def finish(result: FileResult):
+            results.append(result)
+            if on_result:
+                on_result(result, len(results), total)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extract") as threads:
+            # future -> (pending, batch, pages); batch is None for _prepare
+            futures = {}
+            for index, path in enumerate(paths):
+                if should_stop and should_stop():
+                    break
+                ext = os.path.splitext(path)[1].lower()
+                result = FileResult(index=index, path=path, filename=os.path.basename(path))
+                handler = self.registry.get(ext)
+                pending = _PendingFile(result, [], 0, handler=handler.name)
+                version = self.registry.version(ext, ocr_languages) if self.cache is not None else None
+                futures[threads.submit(self._prepare, path, handler, version)] = (pending, None, 0)
+
+            waiting = set(futures)
+            while waiting:
+                done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if should_stop and should_stop():
+                        for other in futures:
+                            other.cancel()
+                        waiting = None
+                        break
+                    pending, batch, pages = futures.pop(future)
+                    result = pending.result
+                    if batch is None:
+                        try:
+                            cached, page_count, size = future.result()
+                        except Exception:
+                            cached, page_count, size = None, 0, 0  # Treat a failing cache as a miss
+                        if cached is None:
+                            before = set(futures)
+                            handler = self.registry.get(os.path.splitext(result.path)[1].lower())
+                            self._dispatch(futures, threads, pending, handler, result.path, ocr_languages,
+                                           page_count, size)
+                            waiting.update(futures.keys() - before)
+                            continue
+                        result.content, result.metadata = cached
+                        if self.metrics:
+                            self.metrics.incr("extract.cache_hits")
+                        finish(result)
+                        continue
+                    self._collect(future, pending, batch, pages, ocr_languages, on_pages, finish, threads)
+
+        results.sort(key=lambda r: r.index)
+        return results
+
+    def _collect(self, future, pending, batch, pages, ocr_languages, on_pages, finish, threads):
+        # Folds one finished task into its file and finishes the file once all of its parts are in
+        result = pending.result
+        try:
+            value, seconds = future.result()
+            pending.parts[batch] = value.text or ""
+            if pending.paged:
+                for key in ("ocr_images", "ocr_cache_hits"):
+                    result.metadata[key] = result.metadata.get(key, 0) + value.metadata.get(key, 0)
+                result.metadata.setdefault("ocr_ms", []).extend(value.metadata.get("ocr_ms", []))
+            else:
+                result.metadata = value.metadata
+            if self.metrics:
+                for ms in value.metadata.get("ocr_ms", []):
+                    self.metrics.record("ocr.image", ms / 1000, file=result.filename)
+            if self.metrics:
+                self.metrics.record(f"extract.{pending.handler}", seconds,
+                                    file=result.filename, pages=pages or None,
+                                    bytes_out=len(pending.parts[batch]))
+        except Exception as e:
+            if result.error is None:
+                result.error = str(e) or type(e).__name__
+        pending.remaining -= 1
+        if pages:
+            pending.pages_done += pages
+            if on_pages:
+                on_pages(result, pending.pages_done, pending.pages_total)
+        if pending.remaining:
+            return
+        if self.metrics:
+            self.metrics.incr("extract.bytes_in", result.metadata.get("bytes", 0))
+            self.metrics.incr("extract.ocr_images", result.metadata.get("ocr_images", 0))
+            self.metrics.incr("extract.ocr_cache_hits", result.metadata.get("ocr_cache_hits", 0))
+            if result.error is not None:
+                self.metrics.incr("extract.errors")
+        if result.error is None:
+            result.content = "".join(pending.parts)
+            if self.cache is not None:
+                # Compressing and storing happen on a worker too
+                ext = os.path.splitext(result.path)[1].lower()
+                threads.submit(self.cache.put, result.path, self.registry.version(ext, ocr_languages),
+                               result.content, result.metadata)
+        pending.parts = []  # The joined text is all that is kept
+        finish(result)
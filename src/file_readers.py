@@ -0,0 +1,372 @@
+import email
+import email.parser
+import email.policy
+import io
+import mailbox
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import config
+import lazy_modules
+import ocr_service
+
+# Handler libraries (PyMuPDF, pytesseract, python-docx, openpyxl,
+# extract_msg, bs4, PIL) are loaded on first use via lazy_modules
+
+_READ_BLOCK_SIZE = 64 * 1024
+
+@dataclass
+class Extracted:
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class FileHandler:
+    name: str
+    extensions: Tuple[str, ...]
+    read: Callable[[str], Extracted]
+    # Bump when the handler's output changes so cached extractions are not reused
+    version: str = "1"
+    # Spends its time in OCR/PDF decoding rather than I/O; runs in a process pool
+    cpu_bound: bool = False
+    # Optional page-range support: count_pages(path) and read_pages(path, first, last),
+    # which returns the Extracted text of that range
+    count_pages: Optional[Callable[[str], int]] = None
+    read_pages: Optional[Callable[[str, int, int], Extracted]] = None
+    # Libraries the reader loads lazily; imported ahead of need by warm-up
+    modules: Tuple[str, ...] = ()
+    # Leading bytes of a genuine file, checked by the scanner before dispatch;
+    # handlers without signatures read text, which must not contain NUL bytes
+    signatures: Tuple[bytes, ...] = ()
+    # Output depends on the OCR languages, which are part of the cache key
+    uses_ocr: bool = False
+
+# Maps file extensions to handlers. Readers are plain module-level functions
+# so they can be pickled into the extraction engine's worker processes.
+class HandlerRegistry:
+    def __init__(self):
+        self._handlers: Dict[str, FileHandler] = {}
+
+    def register(self, handler: FileHandler) -> FileHandler:
+        for ext in handler.extensions:
+            self._handlers[ext.lower()] = handler
+        return handler
+
+    def get(self, ext: str) -> Optional[FileHandler]:
+        return self._handlers.get(ext.lower())
+
+    def __contains__(self, ext: str) -> bool:
+        return ext.lower() in self._handlers
+
+    def extensions(self) -> List[str]:
+        return sorted(self._handlers)
+
+    def modules(self) -> List[str]:
+        names: List[str] = []
+        for handler in self._handlers.values():
+            names.extend(m for m in handler.modules if m not in names)
+        return names
+
+    def version(self, ext: str, ocr_languages: Optional[str] = None) -> str:
+        handler = self._handlers[ext.lower()]
+        key = f"{handler.name}:{handler.version}"
+        if handler.name == "pdf":
+            # Page limits, the image memory ceiling and the OCR thresholds change what gets extracted
+            key += f":{config.PDF_MAX_PAGES}:{config.PDF_IMAGE_MEMORY_MB}"
+            if config.PDF_OCR_ADAPTIVE:
+                key += f":{config.PDF_OCR_MIN_TEXT_CHARS}:{config.PDF_OCR_MIN_IMAGE_PX}:{config.PDF_OCR_DPI}"
+        if handler.uses_ocr:
+            key += f":{ocr_languages or config.OCR_LANGUAGES}:{config.OCR_MAX_MEGAPIXELS}:{int(config.OCR_BINARIZE)}"
+            key += f":{ocr_service.KEY_VERSION}"
+        return key
+
+def describe_metadata(metadata: Dict[str, Any]) -> str:
+    parts = []
+    if "pages" in metadata:
+        parts.append(f"{metadata['pages']} pages")
+    if "sheets" in metadata:
+        parts.append(f"{len(metadata['sheets'])} sheets, {metadata.get('rows', 0)} rows")
+    if "messages" in metadata:
+        parts.append(f"{metadata['messages']} messages")
+    if metadata.get("attachments"):
+        parts.append(f"{len(metadata['attachments'])} attachments")
+    if metadata.get("ocr_ms"):
+        latencies = sorted(metadata["ocr_ms"])
+        ocr = f"{len(latencies)} OCR'd, {latencies[len(latencies) // 2]:.0f} ms median, {latencies[-1]:.0f} ms max"
+        if metadata.get("ocr_cache_hits"):
+            ocr += f", {metadata['ocr_cache_hits']} cached"
+        parts.append(ocr)
+    if "bytes" in metadata:
+        parts.append(f"{metadata['bytes'] / 1024:.1f} KB")
+    return ", ".join(parts)
+
+def _ocr_metadata(results: List[ocr_service.OcrResult]) -> Dict[str, Any]:
+    return {
+        "ocr_images": len(results),
+        "ocr_ms": [round(r.seconds * 1000, 1) for r in results],
+        "ocr_cache_hits": sum(1 for r in results if r.cached),
+    }
+
+# --- File Readers ---
+def read_text(filepath):
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    return Extracted(text, {"bytes": os.path.getsize(filepath)})
+
+def read_image_ocr(filepath):
+    Image = lazy_modules.load("PIL.Image")
+    with Image.open(filepath) as image:
+        size = image.size
+        result = ocr_service.get_service().recognize(image)
+    return Extracted(result.text, {"bytes": os.path.getsize(filepath), "width": size[0], "height": size[1],
+                                   **_ocr_metadata([result])})
+
+def read_docx(filepath):
+    document = lazy_modules.load("docx").Document(filepath)
+    paragraphs = [para.text for para in document.paragraphs]
+    return Extracted("\n".join(paragraphs), {"bytes": os.path.getsize(filepath), "paragraphs": len(paragraphs)})
+
+def read_msg(filepath):
+    msg = lazy_modules.load("extract_msg").Message(filepath)
+    try:
+        text = f"From: {msg.sender}\nTo: {msg.to}\nSubject: {msg.subject}\nDate: {msg.date}\n\n{msg.body}"
+        attachments = [getattr(a, "longFilename", None) or getattr(a, "shortFilename", "") for a in msg.attachments]
+    finally:
+        msg.close()
+    return Extracted(text, {"bytes": os.path.getsize(filepath), "attachments": attachments})
+
+def _html_to_text(html):
+    return lazy_modules.load("bs4").BeautifulSoup(html, "html.parser").get_text("\n")
+
+def _email_to_text(message) -> Tuple[str, List[str]]:
+    # Prefer the plain-text body; fall back to stripped HTML. Attachments are
+    # listed by name but never decoded.
+    headers = "\n".join(f"{name}: {message[name]}" for name in ("From", "To", "Cc", "Subject", "Date") if message[name])
+    body = message.get_body(preferencelist=("plain", "html"))
+    text = ""
+    if body is not None:
+        text = body.get_content()
+        if body.get_content_type() == "text/html":
+            text = _html_to_text(text)
+    attachments = [part.get_filename() or part.get_content_type() for part in message.iter_attachments()]
+    return f"{headers}\n\n{text.strip()}", attachments
+
+def read_eml(filepath):
+    parser = email.parser.BytesFeedParser(policy=email.policy.default)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK_SIZE), b''):
+            parser.feed(block)
+    text, attachments = _email_to_text(parser.close())
+    return Extracted(text, {"bytes": os.path.getsize(filepath), "attachments": attachments})
+
+def read_mbox(filepath):
+    # mailbox.mbox indexes message offsets and loads one message at a time
+    parts = []
+    box = mailbox.mbox(filepath, factory=lambda f: email.message_from_binary_file(f, policy=email.policy.default), create=False)
+    try:
+        for count, message in enumerate(box, start=1):
+            text, _ = _email_to_text(message)
+            parts.append(f"--- Message {count} ---\n{text}\n\n")
+    finally:
+        box.close()
+    return Extracted("".join(parts), {"bytes": os.path.getsize(filepath), "messages": len(parts)})
+
+def read_xlsx(filepath):
+    # read_only mode streams rows from the sheet XML instead of building the
+    # whole workbook in memory
+    workbook = lazy_modules.load("openpyxl").load_workbook(filepath, read_only=True, data_only=True)
+    parts, sheets, rows = [], [], 0
+    try:
+        for sheet in workbook.worksheets:
+            sheets.append(sheet.title)
+            parts.append(f"--- Sheet: {sheet.title} ---\n")
+            for row in sheet.iter_rows(values_only=True):
+                cells = ["" if value is None else str(value) for value in row]
+                if any(cells):
+                    parts.append("\t".join(cells).rstrip("\t") + "\n")
+                    rows += 1
+            parts.append("\n")
+    finally:
+        workbook.close()
+    return Extracted("".join(parts), {"bytes": os.path.getsize(filepath), "sheets": sheets, "rows": rows})
+
+@dataclass
+class PageSegment:
+    page_num: int  # 1-based
+    text: str
+    ocr: List[ocr_service.OcrResult] = field(default_factory=list)
+
+def _fit_image_to_budget(image, max_bytes):
+    # Decoded size is width * height * bands; shrink until it fits the budget.
+    # draft() lets JPEGs decode straight at a reduced scale.
+    decoded = image.width * image.height * len(image.getbands())
+    if decoded <= max_bytes:
+        return image
+    scale = (max_bytes / decoded) ** 0.5
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    image.draft(image.mode, size)
+    image.thumbnail(size)
+    return image
+
+def _ocr_image_bytes(image_bytes, max_bytes) -> ocr_service.OcrResult:
+    with lazy_modules.load("PIL.Image").open(io.BytesIO(image_bytes)) as image:
+        return ocr_service.get_service().recognize(_fit_image_to_budget(image, max_bytes))
+
+# Share of the page covered by images above which a page with no text layer
+# is treated as a scan
+SCANNED_PAGE_COVERAGE = 0.5
+
+def pdf_page_count(filepath):
+    with lazy_modules.load("fitz").open(filepath) as doc:  # PyMuPDF
+        count = doc.page_count
+    if config.PDF_MAX_PAGES > 0:
+        count = min(count, config.PDF_MAX_PAGES)
+    return count
+
+def _ocr_page_raster(fitz, page, dpi, max_bytes):
+    # One grayscale render of the whole page, capped at the image memory budget
+    area = max(1.0, page.rect.width * page.rect.height)
+    zoom = min(dpi / 72, (max_bytes / area) ** 0.5)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    image = lazy_modules.load("PIL.Image").frombytes("L", (pix.width, pix.height), pix.samples)
+    del pix
+    return ocr_service.get_service().recognize(image)
+
+def _ocr_plan(fitz, page, text):
+    # How adaptive OCR treats a page: None when its text layer is enough or
+    # no image is big enough, "scan" when it is rendered whole, otherwise
+    # the infos of the images read one by one (logos and icons left out)
+    if len(text.strip()) >= config.PDF_OCR_MIN_TEXT_CHARS:
+        return None
+    min_px = config.PDF_OCR_MIN_IMAGE_PX
+    images = [info for info in page.get_image_info(xrefs=True)
+              if info["width"] >= min_px and info["height"] >= min_px]
+    if not images:
+        return None
+    page_area = max(1.0, page.rect.width * page.rect.height)
+    covered = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in images)
+    if covered / page_area >= SCANNED_PAGE_COVERAGE:
+        return "scan"
+    return images
+
+class _EarlierImages:
+    # Images that a task for an earlier page range of the same document has
+    # already OCR'd, so a logo or header reused across ranges is read once
+    # per document. Every task applies the same rule to the pages before
+    # its range: an image is read on the first page whose plan reads images
+    # one by one and includes it, which makes exactly one range its owner.
+    def __init__(self, fitz, doc, first_index: int, min_px: int):
+        self.fitz = fitz
+        self.doc = doc
+        self._pages: Dict[int, List[int]] = {}  # xref -> earlier pages showing it at OCR size
+        for page_index in range(first_index):
+            for image in doc.get_page_images(page_index):
+                xref, width, height = image[0], image[2], image[3]
+                if xref and width >= min_px and height >= min_px:
+                    pages = self._pages.setdefault(xref, [])
+                    if not pages or pages[-1] != page_index:
+                        pages.append(page_index)
+        self._read_on: Dict[int, Set[int]] = {}  # Page index -> xrefs its plan reads one by one
+
+    def __contains__(self, xref: int) -> bool:
+        for page_index in self._pages.get(xref, ()):
+            if page_index not in self._read_on:
+                page = self.doc.load_page(page_index)
+                plan = _ocr_plan(self.fitz, page, page.get_text())
+                self._read_on[page_index] = (
+                    {info.get("xref", 0) for info in plan} if isinstance(plan, list) else set()
+                )
+            if xref in self._read_on[page_index]:
+                return True
+        return False
+
+def _adaptive_page_ocr(fitz, doc, page, text, seen_xrefs, earlier: Optional[_EarlierImages],
+                       max_image_bytes) -> Tuple[List[str], List[ocr_service.OcrResult]]:
+    # Returns the OCR parts for one page and the OCR result of each image.
+    # Pages with a real text layer are left alone; small images (logos,
+    # icons) are ignored; an image reused across pages is read once; a page
+    # that is mostly image is rendered once instead of decoding its pieces.
+    plan = _ocr_plan(fitz, page, text)
+    if plan is None:
+        return [], []
+    if plan == "scan":
+        result = _ocr_page_raster(fitz, page, config.PDF_OCR_DPI, max_image_bytes)
+        return [f"\n--- OCR of scanned page {page.number + 1} ---\n", result.text], [result]
+    parts, results = [], []
+    for info in plan:
+        xref = info.get("xref", 0)
+        if not xref or xref in seen_xrefs or (earlier is not None and xref in earlier):
+            continue  # Inline images can't be extracted on their own
+        seen_xrefs.add(xref)
+        image_bytes = doc.extract_image(xref)["image"]
+        result = _ocr_image_bytes(image_bytes, max_image_bytes)
+        del image_bytes
+        parts.append(f"\n--- OCR from image on page {page.number + 1} ---\n")
+        parts.append(result.text)
+        results.append(result)
+    return parts, results
+
+def iter_pdf_pages(filepath, first_page: int = 1, last_page: Optional[int] = None,
+                   max_image_bytes: Optional[int] = None) -> Iterator[PageSegment]:
+    # Yields one segment per page so callers never hold the whole document's
+    # text or more than one decoded image at a time.
+    if max_image_bytes is None:
+        max_image_bytes = config.PDF_IMAGE_MEMORY_MB * 1024 * 1024
+    fitz = lazy_modules.load("fitz")
+    seen_xrefs = set()  # Read in this call, i.e. this page-range task
+    with fitz.open(filepath) as doc:
+        start = max(first_page, 1) - 1
+        stop = doc.page_count if last_page is None else min(last_page, doc.page_count)
+        earlier = None
+        if config.PDF_OCR_ADAPTIVE and start > 0:
+            earlier = _EarlierImages(fitz, doc, start, config.PDF_OCR_MIN_IMAGE_PX)
+        for page_index in range(start, stop):
+            page = doc.load_page(page_index)
+            text = page.get_text()
+            if config.PDF_OCR_ADAPTIVE:
+                parts, results = _adaptive_page_ocr(fitz, doc, page, text, seen_xrefs, earlier, max_image_bytes)
+                yield PageSegment(page_index + 1, text + "".join(parts), results)
+                continue
+            parts, results = [text], []
+            for img in page.get_images(full=True):
+                image_bytes = doc.extract_image(img[0])["image"]
+                results.append(_ocr_image_bytes(image_bytes, max_image_bytes))
+                del image_bytes
+                parts.append(f"\n--- OCR from image on page {page_index+1} ---\n")
+                parts.append(results[-1].text)
+            yield PageSegment(page_index + 1, "".join(parts), results)
+
+def read_pdf_pages(filepath, first_page, last_page) -> Extracted:
+    parts, ocr = [], []
+    for segment in iter_pdf_pages(filepath, first_page, last_page):
+        parts.append(segment.text)
+        ocr.extend(segment.ocr)
+    return Extracted("".join(parts), _ocr_metadata(ocr))
+
+def read_pdf_hybrid(filepath):
+    pages = pdf_page_count(filepath)
+    extracted = read_pdf_pages(filepath, 1, pages)
+    extracted.metadata.update({"bytes": os.path.getsize(filepath), "pages": pages})
+    return extracted
+
+# --- Handler Registry ---
+FILE_HANDLERS = HandlerRegistry()
+FILE_HANDLERS.register(FileHandler("text", ('.txt', '.py', '.js', '.html', '.css'), read_text))
+FILE_HANDLERS.register(FileHandler(
+    "pdf", ('.pdf',), read_pdf_hybrid, version="4", cpu_bound=True, uses_ocr=True,
+    count_pages=pdf_page_count, read_pages=read_pdf_pages,
+    modules=("fitz", "PIL.Image", "pytesseract"), signatures=(b"%PDF",)
+))
+FILE_HANDLERS.register(FileHandler("docx", ('.docx',), read_docx, modules=("docx",), signatures=(b"PK\x03\x04",)))
+FILE_HANDLERS.register(FileHandler("xlsx", ('.xlsx',), read_xlsx, modules=("openpyxl",), signatures=(b"PK\x03\x04",)))
+FILE_HANDLERS.register(FileHandler(
+    "msg", ('.msg',), read_msg, modules=("extract_msg",), signatures=(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",)
+))
+# .eml used to be passed through raw; version 2 parses it
+FILE_HANDLERS.register(FileHandler("eml", ('.eml',), read_eml, version="2", modules=("bs4",)))
+FILE_HANDLERS.register(FileHandler("mbox", ('.mbox',), read_mbox, modules=("bs4",)))
+FILE_HANDLERS.register(FileHandler(
+    "image", ('.png', '.jpg', '.jpeg', '.bmp', '.tiff'), read_image_ocr, cpu_bound=True, uses_ocr=True,
+    modules=("PIL.Image", "pytesseract"),
+    signatures=(b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"BM", b"II*\x00", b"MM\x00*")
+))
@@ -0,0 +1,249 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Tool, VCS and build folders that never hold documents worth reading
+DEFAULT_IGNORES = (
+    ".git/", ".hg/", ".svn/", "node_modules/", "bower_components/", "__pycache__/",
+    "venv/", ".venv/", ".tox/", ".nox/", ".mypy_cache/", ".pytest_cache/", ".ruff_cache/",
+    ".idea/", ".vscode/", ".gradle/", "build/", "dist/", "target/", "*.egg-info/",
+    ".DS_Store", "Thumbs.db", "desktop.ini", "~$*",  # Office lock files
+)
+SNIFF_BYTES = 1024
+
+def _glob_to_regex(glob: str) -> str:
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and glob.find("]", i + 2) != -1:
+            end = glob.find("]", i + 2)
+            body = glob[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+            continue
+        elif c == "\\" and i + 1 < len(glob):
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+@dataclass
+class IgnoreRule:
+    pattern: "re.Pattern"
+    negate: bool
+    dir_only: bool
+
+def parse_ignore_rules(lines: Iterable[str]) -> List[IgnoreRule]:
+    # .gitignore syntax: '#' comments, '!' re-includes, a trailing '/' only
+    # matches directories, and a pattern with a '/' elsewhere is anchored
+    rules = []
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        anchored = "/" in line
+        regex = _glob_to_regex(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append(IgnoreRule(re.compile(regex + r"\Z", flags), negate, dir_only))
+    return rules
+
+# Rule sets from the root down to the current folder. Paths are relative to
+# the scan root with '/' separators; each set only sees paths under its own
+# folder, and the last matching rule wins.
+class IgnoreRules:
+    def __init__(self, sets: Tuple[Tuple[str, Tuple[IgnoreRule, ...]], ...] = ()):
+        self.sets = sets
+
+    def child(self, base: str, rules: Sequence[IgnoreRule]) -> "IgnoreRules":
+        return IgnoreRules(self.sets + ((base, tuple(rules)),)) if rules else self
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        result = False
+        for base, rules in self.sets:
+            if base and not rel.startswith(base):
+                continue
+            sub = rel[len(base):]
+            for rule in rules:
+                if (is_dir or not rule.dir_only) and rule.pattern.match(sub):
+                    result = not rule.negate
+        return result
+
+@dataclass
+class ScanResult:
+    paths: List[str] = field(default_factory=list)  # Walk order: a folder's files, then its subfolders, by name
+    sizes: Dict[str, int] = field(default_factory=dict)
+    total_bytes: int = 0
+    unsupported: int = 0
+    ignored: int = 0  # Files and pruned folders
+    skipped: List[Tuple[str, str]] = field(default_factory=list)  # (path, reason): binary, too large, over budget
+    cancelled: bool = False
+
+    def largest_first(self) -> List[str]:
+        # Big files start first so they don't end up running alone at the end
+        return sorted(self.paths, key=lambda p: self.sizes[p], reverse=True)
+
+# Finds the files worth reading under a folder with os.scandir: ignored
+# folders are pruned before they are entered, unsupported extensions are
+# rejected by name alone, and only candidates are stat'ed and sniffed.
+class FileScanner:
+    def __init__(self, registry, ignore: Sequence[str] = (), default_ignores: bool = True,
+                 gitignore: bool = True, max_file_bytes: int = 0, max_total_bytes: int = 0):
+        self.registry = registry
+        self.rules = IgnoreRules().child("", parse_ignore_rules(
+            list(DEFAULT_IGNORES if default_ignores else ()) + list(ignore)
+        ))
+        self.gitignore = gitignore
+        self.max_file_bytes = max_file_bytes  # 0 = no limit
+        self.max_total_bytes = max_total_bytes
+
+    def _local_rules(self, rules: IgnoreRules, folder: str, base: str) -> IgnoreRules:
+        if not self.gitignore:
+            return rules
+        try:
+            with open(os.path.join(folder, ".gitignore"), "r", encoding="utf-8", errors="ignore") as f:
+                return rules.child(base, parse_ignore_rules(f))
+        except OSError:
+            return rules
+
+    def _check(self, path: str, size: int) -> Optional[str]:
+        # Why the file should not be read, or None
+        if self.max_file_bytes and size > self.max_file_bytes:
+            return f"larger than {self.max_file_bytes / 1048576:.0f} MB"
+        handler = self.registry.get(os.path.splitext(path)[1])
+        try:
+            with open(path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+        except OSError as e:
+            return f"unreadable: {e.strerror or e}"
+        if handler.signatures:
+            if head and not head.startswith(handler.signatures):
+                return f"not a {handler.name} file"
+        elif b"\0" in head:
+            return "binary content"
+        return None
+
+    def _add(self, result: ScanResult, path: str, size: int):
+        if path in result.sizes:
+            return  # Reached again through another of the roots
+        reason = self._check(path, size)
+        if reason is None and self.max_total_bytes and result.total_bytes + size > self.max_total_bytes:
+            reason = f"over the {self.max_total_bytes / 1048576:.0f} MB total budget"
+        if reason is not None:
+            result.skipped.append((path, reason))
+            return
+        result.paths.append(path)
+        result.sizes[path] = size
+        result.total_bytes += size
+
+    def scan(self, root: str, should_stop: Callable[[], bool] = lambda: False) -> ScanResult:
+        return self.scan_all([root], should_stop)
+
+    def scan_all(self, roots: Sequence[str], should_stop: Callable[[], bool] = lambda: False) -> ScanResult:
+        # Several files and folders picked together, in the given order, as
+        # one result under one total budget
+        result = ScanResult()
+        for root in roots:
+            if result.cancelled:
+                break
+            self._scan_root(result, root, should_stop)
+        return result
+
+    def _scan_root(self, result: ScanResult, root: str, should_stop: Callable[[], bool]):
+        if os.path.isfile(root):
+            # A file picked explicitly is read even if a rule would ignore it
+            if os.path.splitext(root)[1] in self.registry:
+                self._add(result, root, os.path.getsize(root))
+            else:
+                result.unsupported += 1
+            return
+
+        # Depth-first with an explicit stack; folders are visited in name order
+        stack = [(root, "", self._local_rules(self.rules, root, ""))]
+        while stack:
+            if should_stop():
+                result.cancelled = True
+                break
+            folder, rel, rules = stack.pop()
+            try:
+                with os.scandir(folder) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+            subfolders = []
+            for entry in entries:
+                entry_rel = rel + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if rules.ignored(entry_rel, True):
+                            result.ignored += 1
+                        else:
+                            subfolders.append(entry)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    if os.path.splitext(entry.name)[1] not in self.registry:
+                        result.unsupported += 1
+                    elif rules.ignored(entry_rel, False):
+                        result.ignored += 1
+                    else:
+                        self._add(result, entry.path, entry.stat().st_size)
+                except OSError:
+                    continue  # Vanished or unreadable mid-scan
+            for entry in reversed(subfolders):
+                entry_rel = rel + entry.name + "/"
+                stack.append((entry.path, entry_rel, self._local_rules(rules, entry.path, entry_rel)))
+
+    def accepts(self, root: str, path: str) -> bool:
+        # For single files reported by the watcher: same rules as a full scan
+        if os.path.splitext(path)[1] not in self.registry or not os.path.isfile(path):
+            return False
+        rel = os.path.relpath(path, root).replace(os.sep, "/") if root else "../"
+        if rel.startswith("../"):
+            return self._check_size(path)
+        rules = self._local_rules(self.rules, root, "")
+        parts = rel.split("/")
+        base = ""
+        for name in parts[:-1]:
+            if rules.ignored(base + name, True):
+                return False
+            base += name + "/"
+            rules = self._local_rules(rules, os.path.join(root, *base.split("/")), base)
+        return not rules.ignored(rel, False) and self._check_size(path)
+
+    def _check_size(self, path: str) -> bool:
+        try:
+            return self._check(path, os.path.getsize(path)) is None
+        except OSError:
+            return False
@@ -0,0 +1,77 @@
+import os
+import threading
+from typing import Callable, Set
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+# Watches a folder and reports changed/deleted paths in debounced batches,
+# so an editor saving a file several times (or a git checkout touching
+# hundreds) results in one re-extraction pass.
+class FolderWatcher(FileSystemEventHandler):
+    def __init__(self, root: str, on_changes: Callable[[Set[str], Set[str]], None],
+                 debounce_seconds: float = 1.0):
+        self.root = root
+        self.on_changes = on_changes
+        self.debounce_seconds = debounce_seconds
+        self._changed: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._observer = None
+
+    def start(self):
+        self._observer = Observer()
+        self._observer.schedule(self, self.root, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def stop(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if self._observer:
+            self._observer.stop()
+            self._observer = None
+
+    def _mark_changed(self, path: str):
+        self._deleted.discard(path)
+        self._changed.add(path)
+
+    def _mark_deleted(self, path: str):
+        self._changed.discard(path)
+        self._deleted.add(path)
+
+    def on_any_event(self, event):
+        if event.event_type not in ("created", "modified", "deleted", "moved"):
+            return
+        with self._lock:
+            if event.event_type == "deleted":
+                self._mark_deleted(event.src_path)
+            elif event.event_type == "moved":
+                self._mark_deleted(event.src_path)
+                if not event.is_directory:
+                    self._mark_changed(event.dest_path)
+                else:
+                    # A moved-in folder produces no events for its files
+                    for root, _, files in os.walk(event.dest_path):
+                        for file in files:
+                            self._mark_changed(os.path.join(root, file))
+            elif not event.is_directory:
+                self._mark_changed(event.src_path)
+            else:
+                return
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce_seconds, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            changed, deleted = self._changed, self._deleted
+            self._changed, self._deleted = set(), set()
+            self._timer = None
+        if changed or deleted:
+            self.on_changes(changed, deleted)
@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import lazy_modules
+from metrics import get_metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def status_code(exc: BaseException) -> Optional[int]:
+    # requests puts the status on the response; google.api_core errors carry it as .code
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return response.status_code
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return status_code(exc) in RETRYABLE_STATUS
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # "Full jitter": spreads retries from many callers instead of syncing them up
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+# One shared client for the SDK and raw HTTP paths: models and connections
+# are reused, calls are rate-limited and capped in concurrency, and 429/5xx
+# failures are retried with exponential backoff.
+class GeminiClient:
+    def __init__(self, api_key: Optional[str], model_name: str,
+                 max_retries: int = 4, requests_per_minute: int = 60, max_concurrency: int = 4,
+                 timeout: float = 120.0, backoff_base: float = 1.0, backoff_cap: float = 30.0,
+                 model_factory: Optional[Callable[[str], object]] = None, metrics=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.model_factory = model_factory or self._sdk_model
+        self.metrics = metrics
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self.semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.requests = 0
+        self.retries = 0
+        self._models: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, max_concurrency))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _sdk_model(self, name: str):
+        # The SDK is slow to import, so it is loaded with the first model
+        genai = lazy_modules.load("google.generativeai")
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(name)
+
+    def model(self, model_name: Optional[str] = None):
+        name = model_name or self.model_name
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self.model_factory(name)
+            return self._models[name]
+
+    def _retry_wait(self, exc: BaseException, attempt: int):
+        # The server's Retry-After when it sends one, else jittered backoff
+        self.retries += 1
+        if self.metrics:
+            self.metrics.incr("api.retries")
+        time.sleep(_retry_after(exc) or backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+
+    def _call(self, fn, span: str = "api.call"):
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            self.bucket.acquire()
+            self.requests += 1
+            try:
+                with self.semaphore:
+                    value = fn()
+                if self.metrics:
+                    self.metrics.record(span, time.perf_counter() - started, attempts=attempt + 1)
+                return value
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    if self.metrics:
+                        self.metrics.record(span, time.perf_counter() - started,
+                                            attempts=attempt + 1, error=type(e).__name__)
+                    raise
+                self._retry_wait(e, attempt)
+                attempt += 1
+
+    def generate(self, prompt: str, model_name: Optional[str] = None, model=None) -> str:
+        # `model` overrides the configured one, e.g. a model bound to a cached context
+        model = model or self.model(model_name)
+        response = self._call(lambda: model.generate_content(
+            prompt, request_options={"timeout": self.timeout}
+        ))
+        return response.text
+
+    def stream(self, prompt: str, model_name: Optional[str] = None, model=None) -> Iterator[object]:
+        # Only opening the stream is retried; once chunks have been shown to
+        # the user a retry would duplicate them. The concurrency slot is held
+        # until the stream is exhausted or closed.
+        model = model or self.model(model_name)
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            self.bucket.acquire()
+            self.requests += 1
+            self.semaphore.acquire()
+            try:
+                response = model.generate_content(prompt, stream=True, request_options={"timeout": self.timeout})
+                iterator = iter(response)
+                first = next(iterator, None)
+            except Exception as e:
+                self.semaphore.release()
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                self._retry_wait(e, attempt)
+                attempt += 1
+                continue
+            break
+        if self.metrics:
+            self.metrics.record("api.first_chunk", time.perf_counter() - started, attempts=attempt + 1)
+        try:
+            if first is not None:
+                yield first
+            yield from iterator
+        finally:
+            self.semaphore.release()
+            if self.metrics:
+                self.metrics.record("api.stream", time.perf_counter() - started)
+
+    def post_json(self, url: str, payload: dict, headers: Optional[dict] = None) -> dict:
+        def post():
+            response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        return self._call(post, span="api.post")
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> GeminiClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            model_factory = None
+            if config.GEMINI_MODEL == "stub":
+                from stub_model import StubModel
+                # Models are built on first use, after _client is set, so the
+                # stub's HTTP calls go through the same pooled session
+                model_factory = lambda name: StubModel(
+                    latency=config.STUB_MODEL_LATENCY_MS / 1000, url=config.STUB_MODEL_URL,
+                    session=_client.session
+                )
+            _client = GeminiClient(
+                config.GEMINI_API_KEY, config.GEMINI_MODEL,
+                max_retries=config.GEMINI_MAX_RETRIES,
+                requests_per_minute=config.GEMINI_REQUESTS_PER_MINUTE,
+                max_concurrency=config.GEMINI_MAX_CONCURRENCY,
+                timeout=config.GEMINI_TIMEOUT_SECONDS,
+                model_factory=model_factory, metrics=get_metrics()
+            )
+        return _client
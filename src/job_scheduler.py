@@ -0,0 +1,151 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Lower runs first: questions jump ahead of background ingestion
+PRIORITY_INTERACTIVE = 0
+PRIORITY_INGEST = 10
+PRIORITY_BACKGROUND = 20
+
+class SchedulerFull(Exception):
+    pass
+
+@dataclass
+class Job:
+    id: int
+    kind: str  # e.g. "ask", "batch", "ingest", "index"
+    label: str
+    priority: int
+    fn: Callable[[threading.Event], Any]
+    group: Optional[str] = None  # A newer job in the same group supersedes this one
+    serial: Optional[str] = None  # Jobs with the same key run one at a time, in submission order
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    state: str = "queued"  # queued, running, done, failed, cancelled
+    submitted: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def describe(self) -> str:
+        if self.state == "running":
+            return f"#{self.id} {self.label} (running {time.monotonic() - self.started:.0f}s)"
+        return f"#{self.id} {self.label} ({self.state})"
+
+# Runs jobs on a few worker threads in priority order. Each job gets its own
+# cancel event, which long-running work checks between steps; queued jobs
+# that are cancelled never start. The queue is bounded so a flood of
+# submissions is refused instead of piling up. Jobs sharing a serial key are
+# held back and queued one at a time, each after the previous one finished.
+class JobScheduler:
+    def __init__(self, workers: int = 3, max_queued: int = 32):
+        self.max_queued = max(1, max_queued)
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._jobs: Dict[int, Job] = {}  # Queued and running jobs
+        self._ids = itertools.count(1)
+        self._lanes: Dict[str, int] = {}  # Serial key -> id of the job that holds it
+        self._waiting: Dict[str, Deque[Job]] = {}  # Serial key -> jobs waiting for it
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True, name=f"job-worker-{i}")
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind: str, label: str, fn: Callable[[threading.Event], Any],
+               priority: int = PRIORITY_BACKGROUND, group: Optional[str] = None,
+               serial: Optional[str] = None) -> Job:
+        with self._lock:
+            if self._closed:
+                raise SchedulerFull("scheduler is shut down")
+            queued = sum(1 for job in self._jobs.values() if job.state == "queued" and not job.cancelled)
+            if queued >= self.max_queued:
+                raise SchedulerFull(f"{queued} jobs are already waiting")
+            job = Job(next(self._ids), kind, label, priority, fn, group, serial)
+            if group is not None:
+                for other in self._jobs.values():
+                    if other.group == group:
+                        other.cancel_event.set()
+            self._jobs[job.id] = job
+            if serial is not None and serial in self._lanes:
+                self._waiting.setdefault(serial, deque()).append(job)
+            else:
+                if serial is not None:
+                    self._lanes[serial] = job.id
+                self._queue.put((priority, job.id, job))
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.cancel_event.set()
+        return True
+
+    def cancel_all(self, kinds: Optional[set] = None):
+        with self._lock:
+            for job in self._jobs.values():
+                if kinds is None or job.kind in kinds:
+                    job.cancel_event.set()
+
+    def jobs(self) -> List[Job]:
+        # Running jobs first, then queued ones in the order they will start
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: (job.state != "running", job.priority, job.id))
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.cancelled:
+                    job.state = "cancelled"
+                    self._jobs.pop(job.id, None)
+                    self._release_lane(job)
+                    continue
+                job.state = "running"
+                job.started = time.monotonic()
+            try:
+                job.result = job.fn(job.cancel_event)
+                job.state = "cancelled" if job.cancelled else "done"
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.state = "failed"
+            job.finished = time.monotonic()
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._release_lane(job)
+
+    def _release_lane(self, job: Job):
+        # Hands the serial key to the next waiting job; called with the lock held
+        if job.serial is None or self._lanes.get(job.serial) != job.id:
+            return
+        waiting = self._waiting.get(job.serial)
+        if waiting:
+            following = waiting.popleft()
+            self._lanes[job.serial] = following.id
+            self._queue.put((following.priority, following.id, following))
+        else:
+            del self._lanes[job.serial]
+            self._waiting.pop(job.serial, None)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        for _ in self._threads:
+            self._queue.put((float("inf"), float("inf"), None))
@@ -0,0 +1,44 @@
+import importlib
+import sys
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+# Heavy optional libraries (PDF, OCR, Office formats, the Gemini SDK) are
+# imported on first use so opening the window doesn't wait for them. The
+# first import of each module is timed for the startup report. Modules loaded
+# here are invisible to PyInstaller; list new ones in the spec's hiddenimports.
+import_seconds: Dict[str, float] = {}
+
+def load(name: str):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    import_seconds.setdefault(name, time.perf_counter() - started)
+    return module
+
+def warm_up(names: Iterable[str], should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Optional[float]]:
+    # Imports each module ahead of need; returns {name: seconds}, with None
+    # for modules that failed to import (the reader reports it when used)
+    timings: Dict[str, Optional[float]] = {}
+    for name in names:
+        if should_stop and should_stop():
+            break
+        already_loaded = name in sys.modules
+        try:
+            load(name)
+        except Exception:
+            timings[name] = None
+            continue
+        timings[name] = 0.0 if already_loaded else import_seconds.get(name, 0.0)
+    return timings
+
+def format_timings(timings: Dict[str, Optional[float]]) -> str:
+    loaded = {name: s for name, s in timings.items() if s}
+    failed = [name for name, s in timings.items() if s is None]
+    parts = [f"{name} {s * 1000:.0f} ms" for name, s in sorted(loaded.items(), key=lambda item: -item[1])]
+    text = f"{sum(loaded.values()) * 1000:.0f} ms" + (f" ({', '.join(parts)})" if parts else "")
+    if failed:
+        text += f"; unavailable: {', '.join(failed)}"
+    return text
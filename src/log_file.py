@@ -0,0 +1,41 @@
+import os
+
+# Append-only copy of everything the log panel shows, plus the per-file
+# detail lines it doesn't. Rolls over to "<path>.1" once it reaches max_bytes.
+class LogFile:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._file = None
+        self._size = 0
+        self.disabled = False
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+
+    def write(self, text: str):
+        if self.disabled:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            if self._size >= self.max_bytes:
+                self._file.close()
+                os.replace(self.path, self.path + ".1")
+                self._open()
+            self._file.write(text)
+            self._size += len(text)
+        except OSError as e:
+            print(f"Log file disabled: {e}")
+            self.disabled = True
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,3 +1,17 @@
+import time
+_STARTED = time.perf_counter()  # For the startup report
+import sys
+import multiprocessing
+if __name__ == "__main__":
+    # Required for the extraction process pool in the frozen Windows build
+    multiprocessing.freeze_support()
+    # A second launch (e.g. from the Explorer context menu) hands its paths
+    # to the running instance and exits before loading Tk or any libraries
+    import config
+    if config.SINGLE_INSTANCE:
+        import single_instance
+        if single_instance.forward(sys.argv[1:]):
+            sys.exit(0)
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
@@ -5,233 +19,302 @@ import keyboard
 from PIL import Image, ImageDraw
 import pystray
 import threading
+import itertools
 import os
-import sys
-import docx
-import openpyxl
-from dotenv import load_dotenv
-import google.generativeai as genai
-import extract_msg
-import email
 import queue
-import pytesseract
-import fitz # PyMuPDF
-import io
-from typing import List, Tuple
-from dataclasses import dataclass
-from datetime import datetime
 from persona_manager import PersonaManager
 from settings_dialog import PersonaDialog
-
-# --- Tesseract Configuration ---
-try:
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-except Exception:
-    print("Tesseract not found at the specified path. Please ensure it's installed and the path is correct.")
-
-# --- Load API Key and Configure Gemini ---
-load_dotenv() 
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-else:
-    print("CRITICAL ERROR: GEMINI_API_KEY not found.")
+from batch_runner import export_csv, export_jsonl
+from pipeline import CopilotPipeline, using_stub_model
+from corpus import Corpus
+from file_readers import FILE_HANDLERS
+from single_instance import InstanceServer
+from job_scheduler import JobScheduler, SchedulerFull, PRIORITY_BACKGROUND, PRIORITY_INGEST, PRIORITY_INTERACTIVE
+from log_file import LogFile
+import lazy_modules
+import config
+_IMPORTED = time.perf_counter()
 
 # --- Global variables ---
+# The backend objects below are built in main(): spawned process-pool
+# workers re-import this module, and must not open databases or threads
 window = None
 log_textbox = None
 prompt_entry = None
 update_queue = queue.Queue()
-processed_content = ""
-processed_filenames = []
+pipeline = None
+conversation_manager = None
+folder_watcher = None
+watch_switch = None
 persona_manager = None
 current_persona = None
-
-@dataclass
-class ChatMessage:
-    role: str  # 'user' or 'assistant'
-    content: str
-    timestamp: datetime
-
-class ConversationManager:
-    def __init__(self):
-        self.history: List[ChatMessage] = []
-        self.max_history = 10  # Keep last 10 messages for context
-
-    def add_message(self, role: str, content: str):
-        self.history.append(ChatMessage(role=role, content=content, timestamp=datetime.now()))
-        if len(self.history) > self.max_history:
-            self.history.pop(0)  # Remove oldest message
-
-    def get_context(self) -> str:
-        if not self.history:
-            return ""
-        
-        context = "Previous conversation:\n"
-        for msg in self.history[-3:]:  # Last 3 messages for immediate context
-            context += f"{msg.role}: {msg.content}\n"
-        return context
-
-    def clear(self):
-        self.history.clear()
+progress_label = None
+stop_button = None
+bypass_cache_checkbox = None
+batch_results = []
+jobs_label = None
+instance_server = None
+scheduler = None
+log_file = None
+log_chunks = []  # Text waiting for the next single insert into log_textbox
+# The ingest whose corpus may be installed; older "finished" messages are dropped
+ingest_ids = itertools.count(1)
+current_ingest_id = None
+reading_paths = []  # Paths of the read in progress, which forwarded paths join
+forwarded_paths = []  # Forwarded paths waiting for FORWARD_BATCH_MS of quiet
+forward_timer = None
+
+# --- Jobs ---
+def submit_job(kind, label, fn, priority, group=None, serial=None):
+    # Returns the Job, or None if too much work is already queued
+    try:
+        return scheduler.submit(kind, label, fn, priority=priority, group=group, serial=serial)
+    except SchedulerFull as e:
+        update_queue.put(("log", f"\nBusy, not starting '{label}': {e}. Try again shortly.\n"))
+        return None
+
+def show_jobs():
+    # Refreshed every tick; widgets are only touched when something changed
+    jobs = scheduler.jobs()
+    state = "normal" if any(job.kind != "index" for job in jobs) else "disabled"
+    if stop_button and stop_button.cget("state") != state:
+        stop_button.configure(state=state)
+    text = "\n".join(job.describe() for job in jobs[:8]) or "No jobs running"
+    if len(pipeline.corpus):
+        text += f"\nContent: {pipeline.corpus.memory_stats().describe()}"
+        if pipeline.corpus.dedup_saved:
+            text += f"\nDuplicates: {pipeline.corpus.dedup_saved / 1048576:.1f} MB not sent"
+    if jobs_label and jobs_label.cget("text") != text:
+        jobs_label.configure(text=text)
 
 # --- Gemini API Function (UPDATED WITH "PROMPT AUGMENTATION") ---
-def call_gemini(instruction):
-    global processed_content, processed_filenames, conversation_manager
-    if not log_textbox or not api_key: 
+def call_gemini(instruction, use_cache=True, cancel_event=None):
+    try:
+        pipeline.ask(instruction, use_cache=use_cache, cancel_event=cancel_event)
+    except Exception as e:
+        update_queue.put(("log", f"An error occurred with the Gemini API:\n{e}"))
+
+def _validate_request(instruction):
+    if not log_textbox or not pipeline.has_credentials(): 
         messagebox.showerror("API Key Error", "Gemini API Key not found.")
-        return
-    if not processed_content.strip():
+        return False
+    if pipeline.corpus.is_empty():
         messagebox.showerror("Error", "No file content has been processed. Please choose a file or folder first.")
-        return
+        return False
     if not instruction or not instruction.strip():
         messagebox.showerror("Error", "Please provide an instruction in the prompt box.")
-        return
+        return False
+    return True
 
-    # Get conversation context
-    chat_context = conversation_manager.get_context()
-    
-    # Format files list
-    formatted_files = "\n".join([
-        f"File {i+1}: {filename}" 
-        for i, filename in enumerate(processed_filenames)
-    ])
-
-    system_instruction = (
-        "You are Vinay's Windows Copilot. Be concise and clear.\n"
-        "If you're answering a follow-up question, use the conversation history for context."
-    )
+def _start_request(kind, label, target, *args):
+    # Starting a new request cancels one that is still streaming
+    submit_job(kind, label, lambda cancel_event: target(*args, cancel_event), PRIORITY_INTERACTIVE, group="request")
 
-    final_prompt = (
-        f"{system_instruction}\n\n"
-        f"--- CONVERSATION HISTORY ---\n{chat_context}\n\n"
-        f"--- FILES ANALYZED ---\n{formatted_files}\n\n"
-        f"--- NEW INSTRUCTION ---\n{instruction}\n\n"
-        f"--- CONTENT ---\n{processed_content}"
-    )
-    
-    log_textbox.insert(tk.END, "\n\n====================\nAsking Gemini... Please wait.\n")
-    
+def send_to_gemini_threaded(instruction, use_cache=True):
+    if _validate_request(instruction):
+        _start_request("ask", f"Ask: {instruction.strip()[:40]}", call_gemini, instruction, use_cache)
+
+# --- Batch Mode ---
+def run_batch(instruction, cancel_event):
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(final_prompt)
-        
-        # Store the conversation
-        conversation_manager.add_message("user", instruction)
-        conversation_manager.add_message("assistant", response.text)
-        
-        log_textbox.insert(tk.END, "--- GEMINI RESPONSE ---\n" + response.text)
+        results = pipeline.run_batch(instruction, cancel_event)
+        update_queue.put(("batch_finished", results))
     except Exception as e:
-        log_textbox.insert(tk.END, f"An error occurred with the Gemini API:\n{e}")
+        update_queue.put(("log", f"An error occurred during batch processing:\n{e}"))
+
+def batch_prompt_action():
+    if prompt_entry:
+        instruction = prompt_entry.get()
+        if _validate_request(instruction):
+            _start_request("batch", f"Each file: {instruction.strip()[:40]}", run_batch, instruction)
 
-def send_to_gemini_threaded(instruction):
-    threading.Thread(target=call_gemini, args=(instruction,), daemon=True).start()
+def export_batch_results():
+    if not batch_results:
+        messagebox.showinfo("Export Batch", "No batch results yet. Use 'Ask Each File' first.")
+        return
+    path = filedialog.asksaveasfilename(
+        defaultextension=".csv",
+        filetypes=[("CSV table", "*.csv"), ("JSON Lines", "*.jsonl")]
+    )
+    if not path:
+        return
+    try:
+        if path.lower().endswith(".jsonl"):
+            export_jsonl(batch_results, path)
+        else:
+            export_csv(batch_results, path)
+        messagebox.showinfo("Export Batch", f"Saved {len(batch_results)} results to {path}")
+    except OSError as e:
+        messagebox.showerror("Export Batch", f"Could not save results: {e}")
+
+def cancel_gemini_request():
+    # Stops answers, batches and reading; index builds finish on their own
+    global reading_paths
+    reading_paths = []  # Later forwarded paths start a new read
+    scheduler.cancel_all({"ask", "batch", "ingest", "patch"})
 
 def custom_prompt_action():
     if prompt_entry:
         instruction = prompt_entry.get()
-        send_to_gemini_threaded(instruction)
-
-# --- File Readers (Unchanged) ---
-def read_image_ocr(filepath):
-    return pytesseract.image_to_string(Image.open(filepath), lang='eng+hin')
-def read_pdf_hybrid(filepath):
-    full_text = ""
-    with fitz.open(filepath) as doc:
-        for page_num, page in enumerate(doc):
-            full_text += page.get_text()
-            image_list = page.get_images(full=True)
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                image = Image.open(io.BytesIO(image_bytes))
-                full_text += f"\n--- OCR from image on page {page_num+1} ---\n"
-                full_text += pytesseract.image_to_string(image, lang='eng+hin')
-    return full_text
-
-FILE_HANDLERS = {
-    '.txt': lambda p: open(p, 'r', encoding='utf-8', errors='ignore').read(),
-    '.py': lambda p: open(p, 'r', encoding='utf-8', errors='ignore').read(),
-    '.js': lambda p: open(p, 'r', encoding='utf-8', errors='ignore').read(),
-    '.html': lambda p: open(p, 'r', encoding='utf-8', errors='ignore').read(),
-    '.css': lambda p: open(p, 'r', encoding='utf-8', errors='ignore').read(),
-    '.pdf': read_pdf_hybrid,
-    '.docx': lambda p: "\n".join(para.text for para in docx.Document(p).paragraphs),
-    '.msg': lambda p: f"From: {extract_msg.Message(p).sender}\nTo: {extract_msg.Message(p).to}\nSubject: {extract_msg.Message(p).subject}\nDate: {extract_msg.Message(p).date}\n\n{extract_msg.Message(p).body}",
-    '.eml': lambda p: open(p, 'r', encoding='utf-8', errors='ignore').read(),
-    '.png': read_image_ocr, '.jpg': read_image_ocr, '.jpeg': read_image_ocr, '.bmp': read_image_ocr, '.tiff': read_image_ocr,
-}
-
-# --- Backend Logic (Unchanged) ---
-def process_path_threaded(path):
-    combined_content_list = []
-    successful_filenames = []
+        use_cache = not (bypass_cache_checkbox and bypass_cache_checkbox.get())
+        send_to_gemini_threaded(instruction, use_cache)
+
+# --- Backend Logic ---
+def process_path_threaded(path, cancel_event, ingest_id):
+    corpus = pipeline.ingest(path, cancel_event)
+    # A superseded or stopped ingest must not replace the current corpus;
+    # the UI thread checks again, since a newer one may start after this put
+    if not cancel_event.is_set():
+        update_queue.put(("finished", (ingest_id, corpus)))
+    else:
+        corpus.close()  # Frees its spill file now rather than at garbage collection
+
+def build_retrieval_index(target, cancel_event):
     try:
-        if os.path.isfile(path):
-            filename = os.path.basename(path)
-            _, ext = os.path.splitext(path)
-            handler = FILE_HANDLERS.get(ext.lower())
-            if handler:
-                try:
-                    content = handler(path)
-                    if content.strip():
-                        combined_content_list.append(content)
-                        successful_filenames.append(filename)
-                        update_queue.put(("log", f"Reading {filename}... OK\n"))
-                    else:
-                        update_queue.put(("log", f"Reading {filename}... SKIPPED (File is empty or contains no text)\n"))
-                except Exception as e:
-                    update_queue.put(("log", f"Reading {filename}... FAILED ({e})\n"))
-            else:
-                update_queue.put(("log", f"Reading {filename}... SKIPPED (Unsupported file type)\n"))
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    filename = os.path.basename(file)
-                    filepath = os.path.join(root, file)
-                    _, ext = os.path.splitext(file)
-                    if ext.lower() in FILE_HANDLERS:
-                        try:
-                            content = FILE_HANDLERS[ext.lower()](filepath)
-                            if content.strip():
-                                combined_content_list.append(f"--- Content of {filename} ---\n{content}\n\n")
-                                successful_filenames.append(filename)
-                                update_queue.put(("log", f"Reading {filename}... OK\n"))
-                            else:
-                                update_queue.put(("log", f"Reading {filename}... SKIPPED (File is empty or contains no text)\n"))
-                        except Exception as e:
-                            update_queue.put(("log", f"Reading {filename}... FAILED ({e})\n"))
-                    else:
-                        update_queue.put(("log", f"Reading {filename}... SKIPPED (Unsupported file type)\n"))
+        result = pipeline.build_index(target)
+        if not cancel_event.is_set():
+            update_queue.put(("index_ready", result))
     except Exception as e:
-        update_queue.put(("log", f"A critical error occurred: {e}\n"))
-    
-    final_content = "".join(combined_content_list)
-    update_queue.put(("finished", (final_content, successful_filenames)))
+        update_queue.put(("log", f"Could not build the search index: {e}\n"))
+
+def refresh_retrieval_index():
+    if config.RETRIEVAL_TOP_K > 0 and len(pipeline.corpus):
+        target = pipeline.corpus
+        submit_job("index", "Build search index", lambda cancel_event: build_retrieval_index(target, cancel_event),
+                   PRIORITY_BACKGROUND, group="index")
+
+# --- Watch Mode ---
+def reextract_changes(target, changed, deleted):
+    # Queued from the watcher's debounce thread; the UI thread applies the patch
+    def job(cancel_event):
+        results = pipeline.reextract(changed)
+        if not cancel_event.is_set():
+            update_queue.put(("patch", (target, results, sorted(deleted))))
+    # One at a time in arrival order, so an older re-read never lands after a newer one
+    submit_job("patch", f"Re-read {len(changed)} changed file(s)", job, PRIORITY_INGEST, serial="patch")
+
+def apply_patch(target, results, deleted):
+    updated, removed = pipeline.apply_patch(target, results, deleted)
+    if updated or removed:
+        summary = []
+        if updated: summary.append(f"updated {', '.join(updated)}")
+        if removed: summary.append(f"removed {', '.join(removed)}")
+        append_log(f"\n[Watch] Folder changed: {'; '.join(summary)}\n")
+        refresh_retrieval_index()
+
+def stop_watching():
+    global folder_watcher
+    if folder_watcher:
+        folder_watcher.stop()
+        folder_watcher = None
+
+def start_watching():
+    global folder_watcher
+    stop_watching()
+    target = pipeline.corpus
+    if not target.is_folder:
+        return
+    from folder_watcher import FolderWatcher  # Loads watchdog
+    folder_watcher = FolderWatcher(
+        target.root, lambda changed, deleted: reextract_changes(target, changed, deleted),
+        debounce_seconds=config.WATCH_DEBOUNCE_MS / 1000
+    )
+    try:
+        folder_watcher.start()
+        append_log(f"Watching {target.root} for changes.\n")
+    except Exception as e:
+        folder_watcher = None
+        append_log(f"Could not watch folder: {e}\n")
+
+def toggle_watch_mode():
+    if watch_switch and watch_switch.get():
+        start_watching()
+    else:
+        stop_watching()
+
+# --- Log Panel ---
+def append_log(text):
+    # Everything is written to the log file now and shown at the next flush
+    if log_file: log_file.write(text)
+    log_chunks.append(text)
+
+def flush_log():
+    # One insert and one scroll per tick, then drop the oldest lines so the
+    # textbox stays small however long the run is
+    if log_file: log_file.flush()
+    if not log_chunks or not log_textbox:
+        return
+    text = "".join(log_chunks)
+    log_chunks.clear()
+    log_textbox.insert(tk.END, text)
+    lines = int(log_textbox.index("end-1c").split(".")[0])
+    if config.LOG_MAX_LINES > 0 and lines > config.LOG_MAX_LINES:
+        log_textbox.delete("1.0", f"{lines - config.LOG_MAX_LINES + 1}.0")
+    log_textbox.see(tk.END)
 
 def check_update_queue():
-    global processed_content, processed_filenames
+    global batch_results, reading_paths
     try:
-        while not update_queue.empty():
-            msg_type, data = update_queue.get_nowait()
-            if msg_type == "log":
-                log_textbox.insert(tk.END, data)
-                log_textbox.see(tk.END)
+        # Bounded per tick so a flood of messages can't freeze the window
+        for _ in range(max(1, config.LOG_MESSAGES_PER_TICK)):
+            try:
+                msg_type, data = update_queue.get_nowait()
+            except queue.Empty:
+                break
+            if msg_type in ("log", "answer"):
+                append_log(data)
+            elif msg_type == "detail":
+                if log_file: log_file.write(data)
+            elif msg_type == "index_ready":
+                pipeline.install_index(*data)
+            elif msg_type == "progress":
+                if progress_label: progress_label.configure(text=data.describe())
+            elif msg_type == "page_progress":
+                filename, pages_done, pages_total = data
+                if progress_label: progress_label.configure(text=f"Reading {filename}: page {pages_done}/{pages_total}")
+            elif msg_type == "patch":
+                target, results, deleted = data
+                if target is pipeline.corpus:
+                    apply_patch(target, results, deleted)
+            elif msg_type == "batch_finished":
+                batch_results = data
+                append_log("Use 'Export Batch' to save the results.\n")
+            elif msg_type == "open_paths":
+                open_forwarded_paths(data)
             elif msg_type == "finished":
-                processed_content, processed_filenames = data
-                log_textbox.insert(tk.END, "\n--- Analysis Complete. Ready for instructions. ---\n")
-                log_textbox.see(tk.END)
+                ingest_id, corpus = data
+                if ingest_id != current_ingest_id:
+                    corpus.close()  # Superseded after it finished
+                    continue
+                reading_paths = []
+                pipeline.set_corpus(corpus)
+                refresh_retrieval_index()
+                append_log("\n--- Analysis Complete. Ready for instructions. ---\n")
+                if watch_switch and watch_switch.get():
+                    start_watching()
     finally:
+        flush_log()
+        show_jobs()
         if window: window.after(100, check_update_queue)
 
 def start_processing(path):
-    global processed_content, processed_filenames
-    processed_content = ""
-    processed_filenames = []
+    # A path, or a list of paths read together into one corpus
+    global current_ingest_id, reading_paths
+    stop_watching()
+    pipeline.set_corpus(Corpus())
     log_textbox.delete("1.0", tk.END)
-    log_textbox.insert("1.0", f"Starting analysis of: {path}\n" + "="*40 + "\n")
-    threading.Thread(target=process_path_threaded, args=(path,), daemon=True).start()
+    log_chunks.clear()
+    paths = [path] if isinstance(path, str) else list(path)
+    reading_paths = paths
+    append_log(f"Starting analysis of: {', '.join(paths)}\n" + "="*40 + "\n")
+    flush_log()
+    if progress_label: progress_label.configure(text="")
+    name = os.path.basename(os.path.normpath(paths[0])) or paths[0]
+    label = f"Read {name}" if len(paths) == 1 else f"Read {name} and {len(paths) - 1} more"
+    # Supersedes any ingest still running, so stale results never arrive
+    current_ingest_id = ingest_id = next(ingest_ids)
+    submit_job("ingest", label, lambda cancel_event: process_path_threaded(paths, cancel_event, ingest_id),
+               PRIORITY_INGEST, group="corpus")
 
 def open_file_dialog():
     filepath = filedialog.askopenfilename()
@@ -241,10 +324,43 @@ def open_folder_dialog():
     folderpath = filedialog.askdirectory()
     if folderpath: start_processing(folderpath)
 
-def load_path_from_startup(path):
+def load_path_from_startup(paths):
     if window:
         show_window()
-        start_processing(path)
+        start_processing(paths)
+
+# --- Single Instance ---
+def open_forwarded_paths(paths):
+    # Paths from another launch. A multi-select "Open with" starts one launch
+    # per file, so paths are gathered until FORWARD_BATCH_MS passes quietly.
+    global forward_timer
+    show_window()
+    if not paths:
+        return
+    forwarded_paths.extend(p for p in paths if p not in forwarded_paths)
+    if forward_timer is not None:
+        window.after_cancel(forward_timer)
+    forward_timer = window.after(config.FORWARD_BATCH_MS, read_forwarded_paths)
+
+def read_forwarded_paths():
+    # Paths that arrive while a read is still running join it: the read
+    # restarts with both, and the extraction cache skips files already done
+    global forward_timer
+    forward_timer = None
+    paths = reading_paths + [p for p in forwarded_paths if p not in reading_paths]
+    forwarded_paths.clear()
+    start_processing(paths)
+
+def start_instance_server():
+    global instance_server
+    if not config.SINGLE_INSTANCE:
+        return
+    server = InstanceServer(lambda paths: update_queue.put(("open_paths", paths)))
+    try:
+        if server.start():
+            instance_server = server
+    except Exception as e:
+        print(f"Single-instance mode disabled: {e}")
 
 def copy_to_clipboard():
     if log_textbox:
@@ -253,13 +369,37 @@ def copy_to_clipboard():
         messagebox.showinfo("Copied", "Log & Response copied to clipboard.")
 
 def clear_text_area():
-    global processed_content, processed_filenames, conversation_manager
+    global current_ingest_id, reading_paths
     if log_textbox:
+        current_ingest_id = None  # A read still in progress is not installed afterwards
+        reading_paths = []
         log_textbox.delete("1.0", tk.END)
-        processed_content = ""
-        processed_filenames = []
+        log_chunks.clear()
+        stop_watching()
+        pipeline.set_corpus(Corpus())
         conversation_manager.clear()
 
+# --- Startup ---
+def report_startup():
+    message = (f"Window ready in {(time.perf_counter() - _STARTED) * 1000:.0f} ms "
+               f"(imports {(_IMPORTED - _STARTED) * 1000:.0f} ms)\n")
+    print(message, end="")
+    update_queue.put(("log", f"\n{message}"))
+
+def warm_up():
+    # Imports what the first file or question will need while the user is
+    # still choosing, so that work doesn't land on the first request
+    names = FILE_HANDLERS.modules() + ["retrieval_index", "gemini_client", "watchdog.observers"]
+    if not using_stub_model():
+        names.append("google.generativeai")
+    started = time.perf_counter()
+    timings = lazy_modules.warm_up(names)
+    update_queue.put(("log", f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms: "
+                             f"{lazy_modules.format_timings(timings)}\n"))
+
+def start_warm_up():
+    threading.Thread(target=warm_up, daemon=True, name="warm-up").start()
+
 # --- Window and Tray Management (Unchanged) ---
 def create_image():
     width=64; height=64; color1="black"; color2="white"
@@ -277,6 +417,11 @@ def toggle_window():
     elif window: hide_window()
 def quit_app(icon, item):
     icon.stop()
+    if instance_server: instance_server.close()
+    scheduler.shutdown()
+    stop_watching()
+    pipeline.close()
+    if log_file: log_file.close()
     if window: window.quit()
 def setup_tray():
     image = create_image()
@@ -286,41 +431,46 @@ def setup_tray():
 
 # --- Main UI Function (Unchanged) ---
 def main():
-    global window, log_textbox, prompt_entry, conversation_manager, persona_manager, current_persona
-    
+    global window, log_textbox, prompt_entry, persona_manager, current_persona, progress_label, stop_button, watch_switch, bypass_cache_checkbox, jobs_label
+    global pipeline, conversation_manager, scheduler, log_file
+
+    if not config.GEMINI_API_KEY:
+        print("CRITICAL ERROR: GEMINI_API_KEY not found.")
+
+    # All backend work reports through update_queue; Tk widgets are not thread-safe
+    pipeline = CopilotPipeline(emit=update_queue.put)
+    conversation_manager = pipeline.conversation
+    # Ingestion, questions and indexing run as tracked, cancellable jobs
+    scheduler = JobScheduler(workers=config.JOB_WORKERS, max_queued=config.JOB_QUEUE_SIZE)
+    if config.LOG_FILE_MB > 0:
+        log_file = LogFile(config.LOG_FILE_PATH, config.LOG_FILE_MB * 1024 * 1024)
+
     # Initialize managers
-    conversation_manager = ConversationManager()
     persona_manager = PersonaManager()
     current_persona = persona_manager.get_persona("default")
+    pipeline.persona = current_persona
 
-    # Window Setup with Smart Dimensions
+    # Window Setup with Smart Dimensions (theme first, so the one window is built styled)
+    ctk.set_appearance_mode("dark")
+    ctk.set_default_color_theme("blue")
     window = ctk.CTk()
     window.title("Gemini Copilot")
     
-    # Set optimal starting size (16:9 ratio, scaled down)
-    window.geometry("1024x640")
-    
     # Set minimum window size to prevent UI breaking
     window.minsize(800, 500)
     
     # Center window on screen
     screen_width = window.winfo_screenwidth()
     screen_height = window.winfo_screenheight()
-    center_x = int((screen_width - 1024) / 2)
-    center_y = int((screen_height - 640) / 2)
-    window.geometry(f"+{center_x}+{center_y}")
-
-    ctk.set_appearance_mode("dark")
-    ctk.set_default_color_theme("blue")
-    window = ctk.CTk()
-    window.title("Gemini Copilot")
-    window.geometry("1100x720")
+    center_x = int((screen_width - 1100) / 2)
+    center_y = int((screen_height - 720) / 2)
+    window.geometry(f"1100x720+{center_x}+{center_y}")
     window.protocol("WM_DELETE_WINDOW", hide_window)
     window.grid_columnconfigure(1, weight=1)
     window.grid_rowconfigure(0, weight=1)
     nav_frame = ctk.CTkFrame(window, width=200, corner_radius=0)
     nav_frame.grid(row=0, column=0, sticky="nsew")
-    nav_frame.grid_rowconfigure(8, weight=1)  # Push everything up, empty space at bottom
+    nav_frame.grid_rowconfigure(9, weight=1)  # Push everything up, empty space at bottom
     
     # Main title
     app_title = ctk.CTkLabel(
@@ -345,6 +495,9 @@ def main():
     folder_button = ctk.CTkButton(nav_frame, text="Choose Folder", command=open_folder_dialog)
     folder_button.grid(row=3, column=0, padx=20, pady=5, sticky="ew")
 
+    watch_switch = ctk.CTkSwitch(nav_frame, text="Watch folder for changes", command=toggle_watch_mode)
+    watch_switch.grid(row=4, column=0, padx=20, pady=5, sticky="w")
+
     # Settings section with clear separation
     settings_label = ctk.CTkLabel(
         nav_frame,
@@ -352,49 +505,58 @@ def main():
         font=ctk.CTkFont(size=12, weight="bold"),
         text_color="gray70"
     )
-    settings_label.grid(row=4, column=0, padx=20, pady=(20, 0), sticky="w")
+    settings_label.grid(row=5, column=0, padx=20, pady=(20, 0), sticky="w")
     
     personas_button = ctk.CTkButton(
         nav_frame, 
         text="Manage AI Personas", 
         command=lambda: PersonaDialog(window, persona_manager)
     )
-    personas_button.grid(row=5, column=0, padx=20, pady=5, sticky="ew")
+    personas_button.grid(row=6, column=0, padx=20, pady=5, sticky="ew")
 
     # Theme selector
     theme_label = ctk.CTkLabel(nav_frame, text="Theme:")
-    theme_label.grid(row=6, column=0, padx=20, pady=(10, 0), sticky="w")
+    theme_label.grid(row=7, column=0, padx=20, pady=(10, 0), sticky="w")
     
     theme_menu = ctk.CTkOptionMenu(
         nav_frame, 
         values=["Dark", "Light", "System"], 
         command=ctk.set_appearance_mode
     )
-    theme_menu.grid(row=7, column=0, padx=20, pady=5, sticky="ew")
+    theme_menu.grid(row=8, column=0, padx=20, pady=5, sticky="ew")
     
     # Add Persona Selector
     persona_label = ctk.CTkLabel(nav_frame, text="Active Persona:")
-    persona_label.grid(row=8, column=0, padx=20, pady=(10, 0), sticky="w")
+    persona_label.grid(row=9, column=0, padx=20, pady=(10, 0), sticky="w")
     
     def on_persona_change(choice):
         global current_persona
         current_persona = persona_manager.get_persona(choice)
+        pipeline.persona = current_persona
     
     persona_menu = ctk.CTkOptionMenu(
         nav_frame,
         values=persona_manager.list_personas(),
         command=on_persona_change
     )
-    persona_menu.grid(row=9, column=0, padx=20, pady=5, sticky="ew")
+    persona_menu.grid(row=10, column=0, padx=20, pady=5, sticky="ew")
     persona_menu.set("default")
 
+    # Running and queued jobs
+    jobs_label = ctk.CTkLabel(nav_frame, text="No jobs running", text_color="gray70", justify="left",
+                              anchor="w", wraplength=180, font=ctk.CTkFont(size=11))
+    jobs_label.grid(row=11, column=0, padx=20, pady=(15, 10), sticky="ew")
+
     main_content_frame = ctk.CTkFrame(window, corner_radius=8, fg_color="transparent")
     main_content_frame.grid(row=0, column=1, padx=20, pady=20, sticky="nsew")
     main_content_frame.grid_columnconfigure(0, weight=1)
     main_content_frame.grid_rowconfigure(0, weight=1)
     log_textbox = ctk.CTkTextbox(main_content_frame, font=("Segoe UI", 13), corner_radius=8)
-    log_textbox.grid(row=0, column=0, columnspan=2, sticky="nsew")
+    log_textbox.grid(row=0, column=0, columnspan=4, sticky="nsew")
     log_textbox.insert("0.0", "Welcome! I can now read text from images (PNG, JPG) and scanned PDFs.")
+    if conversation_manager.history:
+        append_log(f"\nResumed your previous conversation ({len(conversation_manager.history)} recent messages"
+                   f"{' and a summary' if conversation_manager.summary else ''}). Clear starts a new one.\n")
     
     # Prompt entry with Enter key support
     prompt_entry = ctk.CTkEntry(
@@ -413,19 +575,33 @@ def main():
 
     ask_button = ctk.CTkButton(main_content_frame, text="Ask Gemini", command=custom_prompt_action, height=35, corner_radius=8)
     ask_button.grid(row=1, column=1, pady=10, sticky="e")
+    batch_button = ctk.CTkButton(main_content_frame, text="Ask Each File", command=batch_prompt_action, height=35, corner_radius=8, width=110)
+    batch_button.grid(row=1, column=2, padx=(10, 0), pady=10, sticky="e")
+    stop_button = ctk.CTkButton(main_content_frame, text="Stop", command=cancel_gemini_request, height=35, corner_radius=8,
+                                width=70, fg_color="gray50", hover_color="gray60", state="disabled")
+    stop_button.grid(row=1, column=3, padx=(10, 0), pady=10, sticky="e")
     util_frame = ctk.CTkFrame(main_content_frame, fg_color="transparent")
-    util_frame.grid(row=2, column=0, columnspan=2, sticky="ew")
+    util_frame.grid(row=2, column=0, columnspan=4, sticky="ew")
     util_frame.grid_columnconfigure(0, weight=1)
     copy_button = ctk.CTkButton(util_frame, text="Copy Log", command=copy_to_clipboard, fg_color="gray50", hover_color="gray60")
     copy_button.grid(row=0, column=0, padx=(0, 5), sticky="e")
     clear_button = ctk.CTkButton(util_frame, text="Clear", command=clear_text_area, fg_color="gray50", hover_color="gray60")
     clear_button.grid(row=0, column=1, padx=(5, 0), sticky="w")
+    export_button = ctk.CTkButton(util_frame, text="Export Batch", command=export_batch_results, fg_color="gray50", hover_color="gray60")
+    export_button.grid(row=0, column=2, padx=(5, 0), sticky="w")
+    bypass_cache_checkbox = ctk.CTkCheckBox(util_frame, text="Skip response cache")
+    bypass_cache_checkbox.grid(row=0, column=3, padx=(10, 0), sticky="w")
+    progress_label = ctk.CTkLabel(util_frame, text="", text_color="gray70")
+    progress_label.grid(row=0, column=4, padx=(10, 0), sticky="w")
     if len(sys.argv) > 1:
-        path_arg = sys.argv[1]
-        window.after(100, load_path_from_startup, path_arg)
+        window.after(100, load_path_from_startup, sys.argv[1:])
     else:
         hide_window()
     window.after(100, check_update_queue)
+    start_instance_server()
+    window.after_idle(report_startup)
+    if config.WARM_UP_AFTER_MS > 0:
+        window.after(config.WARM_UP_AFTER_MS, start_warm_up)
     window.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+@dataclass
+class Span:
+    name: str
+    seconds: float
+    started: float  # Wall-clock epoch seconds
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+# Collects the spans and counters recorded by one ingest, ask or batch.
+# Work is attributed to the run open in its own thread (see _current_run),
+# so overlapping runs, or a watch-mode patch during a question, don't mix.
+class Run:
+    def __init__(self, label: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started = time.time()
+        self.seconds = 0.0
+        self.spans: List[Span] = []
+        self.counters: Dict[str, float] = {}
+        self._token: Optional[contextvars.Token] = None
+
+    def summary(self) -> str:
+        # One line per span name, slowest total first, then the counters
+        groups: Dict[str, List[Span]] = {}
+        for span in self.spans:
+            groups.setdefault(span.name, []).append(span)
+        lines = [f"--- Timing: {self.label} took {self.seconds:.2f}s ---"]
+        for name, spans in sorted(groups.items(), key=lambda item: -sum(s.seconds for s in item[1])):
+            total = sum(s.seconds for s in spans)
+            line = f"  {name}: {len(spans)} x, {total:.2f}s total, {max(s.seconds for s in spans):.2f}s max"
+            for key in ("bytes_in", "bytes_out", "chars", "tokens"):
+                values = [s.attrs[key] for s in spans if isinstance(s.attrs.get(key), (int, float))]
+                if values:
+                    line += f", {key} {sum(values):,}"
+            lines.append(line)
+        if self.counters:
+            lines.append("  " + ", ".join(f"{k}={v:g}" for k, v in sorted(self.counters.items())))
+        return "\n".join(lines) + "\n"
+
+# The run that spans and counters recorded here belong to. Thread pools
+# doing a run's work wrap their tasks with in_current_run().
+_current_run: "contextvars.ContextVar[Optional[Run]]" = contextvars.ContextVar("metrics_run", default=None)
+
+def in_current_run(fn: Callable) -> Callable:
+    # Binds fn to the caller's run, for calling on another thread
+    run = _current_run.get()
+
+    def bound(*args, **kwargs):
+        token = _current_run.set(run)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_run.reset(token)
+    return bound
+
+# Lightweight span/counter recorder. Spans are cheap (a perf_counter pair
+# and a dict); with trace_path set every finished run is appended to it as
+# JSONL, one line per span plus a closing "run" line with the counters.
+class Metrics:
+    def __init__(self, trace_path: Optional[str] = None):
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+
+    def start_run(self, label: str) -> Run:
+        # The run is current in this thread until end_run()
+        run = Run(label)
+        run._token = _current_run.set(run)
+        return run
+
+    def end_run(self, run: Run) -> Run:
+        if _current_run.get() is run:
+            try:
+                _current_run.reset(run._token)
+            except ValueError:
+                _current_run.set(None)  # Started in another context
+        run.seconds = time.time() - run.started
+        if self.trace_path:
+            self._write_trace(run)
+        return run
+
+    @contextmanager
+    def run(self, label: str):
+        run = self.start_run(label)
+        try:
+            yield run
+        finally:
+            self.end_run(run)
+
+    def record(self, name: str, seconds: float, **attrs):
+        # For durations measured elsewhere, e.g. inside a worker process
+        run = _current_run.get()
+        if run is None:
+            return
+        span = Span(name, seconds, time.time() - seconds, attrs)
+        with self._lock:
+            run.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        # Yields the attrs dict so the body can add sizes it learns as it goes
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, **attrs)
+
+    def incr(self, counter: str, amount: float = 1):
+        run = _current_run.get()
+        if run is None:
+            return
+        with self._lock:
+            run.counters[counter] = run.counters.get(counter, 0) + amount
+
+    def _write_trace(self, run: Run):
+        try:
+            with open(self.trace_path, 'a', encoding='utf-8') as f:
+                for span in run.spans:
+                    f.write(json.dumps({
+                        "run": run.id, "type": "span", "name": span.name,
+                        "started": round(span.started, 6), "seconds": round(span.seconds, 6),
+                        **span.attrs
+                    }, default=str) + "\n")
+                f.write(json.dumps({
+                    "run": run.id, "type": "run", "name": run.label,
+                    "started": round(run.started, 6), "seconds": round(run.seconds, 6),
+                    "counters": run.counters
+                }) + "\n")
+        except OSError as e:
+            print(f"Could not write trace: {e}")
+
+_metrics: Optional[Metrics] = None
+_metrics_lock = threading.Lock()
+
+def get_metrics() -> Metrics:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            import config
+            _metrics = Metrics(config.METRICS_TRACE_PATH)
+        return _metrics
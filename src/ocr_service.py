@@ -0,0 +1,221 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+import lazy_modules
+
+# --- Tesseract Configuration ---
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+def _tesseract():
+    pytesseract = lazy_modules.load("pytesseract")
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
+
+@dataclass
+class OcrResult:
+    text: str
+    seconds: float
+    cached: bool = False
+
+# --- Job languages ---
+# Readers run on pool threads or in worker processes and only get a path, so
+# the languages for the current job are set around each call by the engine
+_local = threading.local()
+
+@contextmanager
+def job_languages(languages: Optional[str]):
+    previous = getattr(_local, "languages", None)
+    _local.languages = languages
+    try:
+        yield
+    finally:
+        _local.languages = previous
+
+def current_languages() -> str:
+    return getattr(_local, "languages", None) or config.OCR_LANGUAGES
+
+# --- Preprocessing ---
+def _otsu_threshold(histogram) -> int:
+    # Grey level that best separates ink from paper
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = background_weighted = 0
+    best, threshold = -1.0, 127
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_weighted += level * count
+        mean_b = background_weighted / background
+        mean_f = (weighted_total - background_weighted) / foreground
+        between = background * foreground * (mean_b - mean_f) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold
+
+def preprocess(image, max_pixels: int, binarize: bool):
+    # Greyscale, downscaled past max_pixels and optionally binarized: what
+    # Tesseract would do internally, but on a much smaller image
+    if max_pixels and image.width * image.height > max_pixels:
+        scale = (max_pixels / (image.width * image.height)) ** 0.5
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image.draft("L", size)  # JPEGs decode straight at the reduced scale
+        if image.width * image.height > max_pixels:
+            image = image.resize(size)
+    if image.mode != "L":
+        image = image.convert("L")
+    if binarize:
+        threshold = _otsu_threshold(image.histogram())
+        image = image.point(lambda value: 255 if value > threshold else 0)
+    return image
+
+def image_key(image) -> str:
+    # SHA-256 of the preprocessed pixels: a byte-identical scan, letterhead or
+    # stamp reused across files hits, but pages that differ in a single figure
+    # never share text. Re-encoded copies that decode differently miss.
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+# --- Cache ---
+# Bumped when cache keys change, so extractions built on old hits are redone
+KEY_VERSION = 2
+# Recognized text by (languages, pixel hash). Shared by the worker processes
+# through SQLite; each entry is small, so the budget is checked now and then
+# rather than on every insert.
+class OcrCache:
+    EVICT_EVERY = 64
+
+    def __init__(self, db_path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_access ON ocr (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE ocr SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            return row[0] if row else None
+
+    def put(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time())
+            )
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM ocr ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM ocr WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# --- Engines ---
+# tesserocr keeps a loaded Tesseract in-process, one per thread and language
+# set, so worker processes reuse it for every image. Without it each image
+# goes through pytesseract, which runs the tesseract executable.
+class _TesserocrEngine:
+    def __init__(self, tesserocr):
+        self.tesserocr = tesserocr
+        self._local = threading.local()
+
+    def recognize(self, image, languages: str) -> str:
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get(languages)
+        if api is None:
+            api = apis[languages] = self.tesserocr.PyTessBaseAPI(lang=languages)
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+class _PytesseractEngine:
+    def recognize(self, image, languages: str) -> str:
+        return _tesseract().image_to_string(image, lang=languages)
+
+def _make_engine(name: str):
+    if name in ("auto", "tesserocr"):
+        try:
+            return _TesserocrEngine(lazy_modules.load("tesserocr"))
+        except ImportError:
+            if name == "tesserocr":
+                raise
+    return _PytesseractEngine()
+
+class OcrService:
+    def __init__(self, engine, cache: Optional[OcrCache] = None, max_pixels: int = 0, binarize: bool = True):
+        self.engine = engine
+        self.cache = cache
+        self.max_pixels = max_pixels
+        self.binarize = binarize
+
+    def recognize(self, image, languages: Optional[str] = None) -> OcrResult:
+        started = time.perf_counter()
+        languages = languages or current_languages()
+        image = preprocess(image, self.max_pixels, self.binarize)
+        key = None
+        if self.cache is not None:
+            key = f"{KEY_VERSION}:{languages}:{image_key(image)}"
+            text = self.cache.get(key)
+            if text is not None:
+                return OcrResult(text, time.perf_counter() - started, cached=True)
+        text = self.engine.recognize(image, languages)
+        if key is not None:
+            self.cache.put(key, text)
+        return OcrResult(text, time.perf_counter() - started)
+
+_service: Optional[OcrService] = None
+_service_lock = threading.Lock()
+
+def get_service() -> OcrService:
+    # One per process: worker processes each build their own on first use
+    global _service
+    with _service_lock:
+        if _service is None:
+            cache = None
+            if config.OCR_CACHE_MB > 0:
+                try:
+                    cache = OcrCache(config.OCR_CACHE_PATH, config.OCR_CACHE_MB * 1024 * 1024)
+                except sqlite3.Error as e:
+                    print(f"OCR cache disabled: {e}")
+            _service = OcrService(
+                _make_engine(config.OCR_ENGINE), cache,
+                max_pixels=config.OCR_MAX_MEGAPIXELS * 1_000_000, binarize=config.OCR_BINARIZE
+            )
+        return _service
@@ -0,0 +1,632 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Sequence, Tuple, Union
+
+import config
+from batch_runner import BATCH_PROMPT, BatchResult, BatchRunner
+from conversation import ConversationManager
+from conversation_store import ConversationStore
+from content_store import ContentStore
+from context_cache import ContextCache, GeminiContextBackend, LocalContextBackend, caching_model
+from corpus import Corpus
+from extraction_cache import ExtractionCache
+from extraction_engine import ExtractionEngine, FileResult
+from file_readers import FILE_HANDLERS, describe_metadata
+from file_scanner import FileScanner, ScanResult
+from metrics import Run, get_metrics
+from prompt_planner import CHARS_PER_TOKEN, PromptPlanner, chunk_documents, estimate_tokens
+from response_cache import ResponseCache, make_key
+
+if TYPE_CHECKING:
+    from retrieval_index import RetrievalIndex  # Loads numpy, so only for annotations
+
+BASE_SYSTEM_INSTRUCTION = "You are Vinay's Windows Copilot. Be concise and clear."
+
+def _open_extraction_cache():
+    if config.EXTRACTION_CACHE_MB <= 0:
+        return None
+    try:
+        return ExtractionCache(config.EXTRACTION_CACHE_PATH, config.EXTRACTION_CACHE_MB * 1024 * 1024)
+    except Exception as e:
+        print(f"Extraction cache disabled: {e}")
+        return None
+
+def _open_response_cache():
+    if config.RESPONSE_CACHE_MB <= 0:
+        return None
+    try:
+        return ResponseCache(
+            config.RESPONSE_CACHE_PATH, config.RESPONSE_CACHE_MB * 1024 * 1024,
+            ttl_seconds=config.RESPONSE_CACHE_TTL_HOURS * 3600,
+            memory_entries=config.RESPONSE_CACHE_MEMORY_ENTRIES
+        )
+    except Exception as e:
+        print(f"Response cache disabled: {e}")
+        return None
+
+def _open_conversation_store():
+    if not config.CONVERSATION_PERSIST:
+        return None
+    try:
+        return ConversationStore(config.CONVERSATION_DB_PATH, config.CONVERSATION_MAX_SESSIONS)
+    except Exception as e:
+        print(f"Conversation history will not be saved: {e}")
+        return None
+
+def _chunk_text(chunk):
+    # Chunks without text (e.g. a safety stop) raise on .text
+    try:
+        return chunk.text
+    except Exception:
+        return ""
+
+def _content_tokens(corpus: Corpus) -> int:
+    # Same estimate as estimate_tokens(corpus.render()), without rendering
+    return -(-corpus.rendered_chars() // CHARS_PER_TOKEN)
+
+def _merge_note(corpus: Corpus, filename: str) -> str:
+    # Near-copies differ somewhere, so they are never described as the same content
+    notes = []
+    if filename in corpus.merged:
+        notes.append(f"same content as: {', '.join(corpus.merged[filename])}")
+    if filename in corpus.near_merged:
+        notes.append(f"near-duplicate of: {', '.join(corpus.near_merged[filename])} (not included; may differ)")
+    return f" ({'; '.join(notes)})" if notes else ""
+
+def _get_client():
+    # Imported on first use: requests and the client module aren't needed to open the window
+    from gemini_client import get_client
+    return get_client()
+
+def using_stub_model():
+    return config.GEMINI_MODEL == "stub"
+
+def is_supported(path):
+    return os.path.splitext(path)[1].lower() in FILE_HANDLERS
+
+# Aggregate counters for an ingest or batch run, sent with each "progress" message
+@dataclass
+class Progress:
+    total: int
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def describe(self, noun: str = "files") -> str:
+        text = f"Processed {self.done}/{self.total} {noun}"
+        if self.failed:
+            text += f", {self.failed} failed"
+        if self.skipped:
+            text += f", {self.skipped} skipped"
+        return text + f" ({self.rate:.1f}/s)"
+
+# The ingest -> context -> ask pipeline, independent of any UI.
+#
+# Progress and output are reported through `emit((msg_type, data))`: the
+# GUI passes update_queue.put, the CLI prints. Message types are "log",
+# "detail" (per-file lines that are too many to show, for the log file),
+# "answer" (response text), "progress" (a Progress) and "page_progress".
+#
+# Only the GUI persists the conversation: headless runs pass
+# persist_conversation=False so they neither resume nor overwrite its session.
+class CopilotPipeline:
+    def __init__(self, emit: Optional[Callable[[Tuple[str, Any]], None]] = None,
+                 persist_conversation: bool = True):
+        self.emit = emit or (lambda message: None)
+        self.extraction_cache = _open_extraction_cache()
+        self.response_cache = _open_response_cache()
+        self.metrics = get_metrics()
+        self.planner = PromptPlanner(
+            config.PROMPT_TOKEN_BUDGET, config.PROMPT_CHUNK_TOKENS, config.MAP_REDUCE_CONCURRENCY
+        )
+        self.engine = ExtractionEngine(
+            FILE_HANDLERS,
+            max_workers=config.EXTRACTION_WORKERS, max_processes=config.EXTRACTION_PROCESSES,
+            cache=self.extraction_cache, pages_per_task=config.PDF_PAGES_PER_TASK,
+            metrics=self.metrics
+        )
+        self.scanner = FileScanner(
+            FILE_HANDLERS, ignore=config.SCAN_IGNORE, default_ignores=config.SCAN_DEFAULT_IGNORES,
+            gitignore=config.SCAN_GITIGNORE, max_file_bytes=config.SCAN_MAX_FILE_MB * 1024 * 1024,
+            max_total_bytes=config.SCAN_MAX_TOTAL_MB * 1024 * 1024
+        )
+        self.conversation = ConversationManager(
+            _open_conversation_store() if persist_conversation else None,
+            max_history=config.CONVERSATION_WINDOW, context_tokens=config.CONVERSATION_CONTEXT_TOKENS,
+            summary_tokens=config.CONVERSATION_SUMMARY_TOKENS, summary_batch=config.CONVERSATION_SUMMARY_BATCH
+        )
+        self.corpus = Corpus()
+        self.retrieval_index: Optional["RetrievalIndex"] = None
+        self.persona = None  # Active AIPersona, if any
+        self.context_cache: Optional[ContextCache] = None  # Created with the first eligible question
+        self.context_caching = config.CONTEXT_CACHE
+        # Corpus the last question was asked about; a resumed or earlier
+        # conversation about other files doesn't make a question a follow-up
+        self._asked_corpus: Optional[Corpus] = None
+
+    def _log(self, text: str):
+        self.emit(("log", text))
+
+    def _detail(self, text: str):
+        self.emit(("detail", text))
+
+    def has_credentials(self) -> bool:
+        return bool(config.GEMINI_API_KEY) or using_stub_model()
+
+    def close(self):
+        self.engine.shutdown()
+        if self.context_cache is not None:
+            self.context_cache.invalidate()
+        if self.conversation.store is not None:
+            self.conversation.store.close()
+        # Closing checkpoints the SQLite WAL files
+        if self.response_cache is not None:
+            self.response_cache.close()
+        if self.extraction_cache is not None:
+            self.extraction_cache.close()
+        self.corpus.close()
+
+    def _finish_run(self, run: Run):
+        self.metrics.end_run(run)
+        if config.METRICS_SUMMARY:
+            self._log("\n" + run.summary())
+
+    # --- Ingest ---
+    def _report_result(self, progress: Progress, result: FileResult):
+        # Failures stay visible; the per-file OK/SKIPPED lines only go to the detail log
+        progress.done += 1
+        if result.error is not None:
+            progress.failed += 1
+            self._log(f"Reading {result.filename}... FAILED ({result.error})\n")
+        elif result.ok:
+            details = describe_metadata(result.metadata)
+            self._detail(f"Reading {result.filename}... OK{f' ({details})' if details else ''}\n")
+        else:
+            progress.skipped += 1
+            self._detail(f"Reading {result.filename}... SKIPPED (File is empty or contains no text)\n")
+        self.emit(("progress", progress))
+
+    def _report_pages(self, result: FileResult, pages_done: int, pages_total: int):
+        self.emit(("page_progress", (result.filename, pages_done, pages_total)))
+
+    def ingest(self, path: Union[str, Sequence[str]], cancel_event: Optional[threading.Event] = None,
+               ocr_languages: Optional[str] = None) -> Corpus:
+        # Builds and returns a new corpus without installing it, so a caller
+        # on another thread decides when it replaces the current one. A
+        # cancelled ingest returns early with whatever was read so far.
+        # Several paths (e.g. a multi-select "Open with") make one corpus.
+        paths = [path] if isinstance(path, str) else list(path)
+        run = self.metrics.start_run("ingest")
+        try:
+            return self._ingest(paths, cancel_event or threading.Event(), ocr_languages)
+        finally:
+            self._finish_run(run)
+
+    def _ingest(self, paths: List[str], cancel_event: threading.Event, ocr_languages: Optional[str]) -> Corpus:
+        store = ContentStore(config.CONTENT_MEMORY_MB * 1024 * 1024, config.CONTENT_SPILL_DIR)
+        if len(paths) == 1:
+            new_corpus = Corpus(paths[0], store)
+        else:
+            new_corpus = Corpus("", store, labelled=True)
+        new_corpus.ocr_languages = ocr_languages
+        cache_hits = self.extraction_cache.stats.hits if self.extraction_cache else 0
+        cache_misses = self.extraction_cache.stats.misses if self.extraction_cache else 0
+        progress = Progress(0)
+        scan = ScanResult()
+        try:
+            started = time.perf_counter()
+            for missing in [p for p in paths if not os.path.exists(p)]:
+                self._log(f"Path not found: {missing}\n")
+            existing = [p for p in paths if os.path.exists(p)]
+            if existing:
+                scan = self.scanner.scan_all(existing, cancel_event.is_set)
+            if len(paths) == 1 and os.path.isfile(paths[0]) and scan.unsupported:
+                self._log(f"Reading {os.path.basename(paths[0])}... SKIPPED (Unsupported file type)\n")
+            for skipped, reason in scan.skipped:
+                self._detail(f"Reading {os.path.basename(skipped)}... SKIPPED ({reason})\n")
+            self.metrics.record("walk", time.perf_counter() - started, files=len(scan.paths),
+                                bytes=scan.total_bytes, ignored=scan.ignored)
+
+            # Text goes into the corpus as each file finishes, so only the
+            # store's RAM ceiling bounds memory; walk order is restored after
+            progress = Progress(len(scan.paths))
+
+            def on_result(result, done, total):
+                self._report_result(progress, result)
+                span["bytes_out"] += len(result.content)
+                if result.ok:
+                    new_corpus.upsert(result.path, result.content)
+                result.content = ""
+
+            with self.metrics.span("extract", files=len(scan.paths), bytes_out=0) as span:
+                self.engine.run(scan.largest_first(), on_result=on_result, on_pages=self._report_pages,
+                                should_stop=cancel_event.is_set, ocr_languages=ocr_languages)
+            new_corpus.reorder(scan.paths)
+            if config.DEDUP and len(new_corpus) > 1 and not cancel_event.is_set():
+                self._deduplicate(new_corpus)
+        except Exception as e:
+            self._log(f"A critical error occurred: {e}\n")
+
+        if cancel_event.is_set():
+            self._log(f"Reading cancelled after {progress.done} of {progress.total} files.\n")
+        elif progress.total or scan.unsupported or scan.skipped:
+            summary = f"Read {progress.done - progress.failed - progress.skipped} of {progress.total} files"
+            if progress.failed or progress.skipped:
+                summary += f" ({progress.failed} failed, {progress.skipped} empty)"
+            if scan.skipped:
+                summary += f"; {len(scan.skipped)} binary, oversized or over-budget files skipped"
+            if scan.unsupported:
+                summary += f"; {scan.unsupported} unsupported files skipped"
+            if scan.ignored:
+                summary += f"; {scan.ignored} ignored files/folders"
+            self._log(f"{summary} in {time.perf_counter() - progress.started:.1f}s ({progress.rate:.1f} files/s)\n")
+
+        if len(new_corpus):
+            self._log(f"Content: {new_corpus.memory_stats().describe()}\n")
+        if self.extraction_cache:
+            stats = self.extraction_cache.stats
+            self._log(f"Extraction cache: {stats.hits - cache_hits} hits, {stats.misses - cache_misses} misses "
+                      f"({stats.total_bytes / 1048576:.1f} MB on disk)\n")
+        return new_corpus
+
+    def _deduplicate(self, corpus: Corpus):
+        from dedup import Deduplicator  # Loads numpy
+        with self.metrics.span("dedup", files=len(corpus)) as span:
+            report = Deduplicator(
+                near_threshold=config.DEDUP_SIMILARITY / 100, paragraphs=config.DEDUP_PARAGRAPHS,
+                min_paragraph_chars=config.DEDUP_MIN_PARAGRAPH_CHARS, near_merge=config.DEDUP_NEAR
+            ).run(corpus)
+            span["bytes_in"] = report.bytes_before
+            span["bytes_out"] = report.bytes_before - report.bytes_saved
+        for kept, copies in report.merged.items():
+            names = [os.path.basename(p) for p in copies]
+            corpus.merged.setdefault(os.path.basename(kept), []).extend(names)
+            self._detail(f"Merged into {os.path.basename(kept)}: {', '.join(names)}\n")
+        for kept, copies in report.near_merged.items():
+            names = [os.path.basename(p) for p in copies]
+            corpus.near_merged.setdefault(os.path.basename(kept), []).extend(names)
+            self._detail(f"Near-duplicates of {os.path.basename(kept)} left out: {', '.join(names)}\n")
+        corpus.dedup_saved = report.bytes_saved
+        if report.bytes_saved:
+            self._log(f"Duplicates: {report.describe()}\n")
+
+    def set_corpus(self, corpus: Corpus):
+        self.corpus = corpus
+        self.retrieval_index = None
+        self._asked_corpus = None
+        if self.context_cache is not None:
+            self.context_cache.invalidate()  # Would be replaced on the next question anyway
+
+    def load(self, path: str, ocr_languages: Optional[str] = None) -> Corpus:
+        # Headless convenience: ingest, install and index in one blocking call
+        self.set_corpus(self.ingest(path, ocr_languages=ocr_languages))
+        if config.RETRIEVAL_TOP_K > 0 and len(self.corpus):
+            self.install_index(*self.build_index(self.corpus))
+        return self.corpus
+
+    def reextract(self, changed) -> List[FileResult]:
+        # Watcher events cover every file; ignored, binary and oversized ones are dropped as in a scan
+        root = self.corpus.root if self.corpus.is_folder else ""
+        paths = sorted(p for p in changed if self.scanner.accepts(root, p))
+        return self.engine.run(paths, ocr_languages=self.corpus.ocr_languages) if paths else []
+
+    def apply_patch(self, target: Corpus, results: List[FileResult], deleted) -> Tuple[List[str], List[str]]:
+        updated, removed = [], []
+        for path in deleted:
+            if target.remove(path):
+                removed.append(os.path.basename(path))
+        for result in results:
+            if result.error is not None:
+                # Often an editor still saving; the previous text stays until
+                # the next change, unless the file is gone
+                self._log(f"Re-reading {result.filename}... FAILED ({result.error})\n")
+                if not os.path.exists(result.path) and target.remove(result.path):
+                    removed.append(result.filename)
+            elif result.ok:
+                if target.upsert(result.path, result.content):
+                    updated.append(result.filename)
+            elif target.remove(result.path):
+                removed.append(result.filename)  # Read fine, but now empty
+        if (updated or removed) and target is self.corpus:
+            self.retrieval_index = None
+        return updated, removed
+
+    # --- Context ---
+    def build_index(self, target: Corpus) -> Tuple[Corpus, int, "RetrievalIndex"]:
+        from retrieval_index import RetrievalIndex  # Loads numpy
+        version = target.version
+        return target, version, RetrievalIndex(chunk_documents(target.iter_documents(), config.RETRIEVAL_CHUNK_TOKENS))
+
+    def install_index(self, target: Corpus, version: int, index: "RetrievalIndex") -> bool:
+        # Drop indexes built for content that has since changed
+        if target is self.corpus and version == self.corpus.version:
+            self.retrieval_index = index
+            return True
+        return False
+
+    def _condense_content(self, client, corpus, instruction, cancel_event, prompt_header):
+        self._log(f"Content is larger than the {self.planner.token_budget:,}-token budget. "
+                  f"Condensing {len(corpus)} file(s) in parallel first...\n")
+
+        def on_progress(stage, done, total):
+            self._log(f"  {stage}: {done}/{total} chunks\n")
+
+        return self.planner.map_reduce(
+            client.generate,
+            instruction, corpus.iter_documents(),
+            on_progress=on_progress, should_stop=cancel_event.is_set,
+            reserve_tokens=self.planner.count_tokens(f"{prompt_header}--- CONTENT ---\n")
+        )
+
+    def _retrieve_content(self, index, instruction):
+        hits = index.search(instruction, config.RETRIEVAL_TOP_K)
+        if not hits:
+            return None
+        cited_files = {chunk.filename for chunk, _ in hits}
+        self._log(f"Follow-up: sending {len(hits)} of {len(index)} chunks "
+                  f"from {len(cited_files)} file(s).\n")
+        return (
+            "Only the passages most relevant to the instruction are included. "
+            "Cite the [Source: ...] label of any passage you use.\n\n"
+            + "\n\n".join(f"[Source: {chunk.label}]\n{chunk.text}" for chunk, _ in hits)
+        )
+
+    def _cached_context(self, client, system_instruction: str, corpus: Corpus, files_header: str):
+        # Registers corpus + persona once; follow-ups then send only the
+        # history and the new instruction. A transient failure (429/5xx,
+        # network) skips caching for this question; any other (e.g. a model
+        # without caching support) turns it off for the session.
+        if self.context_cache is None:
+            model_name = config.GEMINI_MODEL
+            if using_stub_model():
+                backend = LocalContextBackend(client.model_factory)
+            else:
+                backend = GeminiContextBackend(config.GEMINI_API_KEY)
+                try:
+                    model_name = caching_model(model_name)
+                except ValueError as e:
+                    self.context_caching = False
+                    self._log(f"Context caching off: {e}.\n")
+                    return None
+            self.context_cache = ContextCache(
+                backend, model_name, config.CONTEXT_CACHE_MIN_TOKENS, config.CONTEXT_CACHE_TTL_MINUTES * 60
+            )
+        creates = self.context_cache.stats.creates
+        try:
+            with self.metrics.span("prompt.context_cache"):
+                cached = self.context_cache.get(
+                    system_instruction, lambda: "".join([files_header, *corpus.iter_render()]),
+                    estimate_tokens(files_header) + _content_tokens(corpus),
+                    f"{files_header}\n{corpus.fingerprint()}"
+                )
+        except Exception as e:
+            from gemini_client import is_retryable
+            if is_retryable(e):
+                self._log(f"Context cache busy, sending the full content this time: {e}\n")
+                return None
+            self.context_caching = False
+            self._log(f"Context caching unavailable, sending the full content instead: {e}\n")
+            return None
+        if cached is not None:
+            created = self.context_cache.stats.creates > creates
+            self.metrics.incr("context_cache.creates" if created else "context_cache.reuses")
+            self._log(f"{'Cached' if created else 'Reusing cached'} context: ~{cached.tokens:,} tokens "
+                      f"of files and persona ({cached.name}).\n")
+        return cached
+
+    # --- Ask ---
+    def _persona_prompt(self) -> str:
+        return self.persona.system_prompt if self.persona else BASE_SYSTEM_INSTRUCTION
+
+    def ask(self, instruction: str, use_cache: bool = True,
+            cancel_event: Optional[threading.Event] = None, stream: Optional[bool] = None) -> str:
+        run = self.metrics.start_run("ask")
+        try:
+            return self._ask(instruction, use_cache, cancel_event, stream)
+        finally:
+            self._finish_run(run)
+
+    def _ask(self, instruction, use_cache, cancel_event, stream) -> str:
+        cancel_event = cancel_event or threading.Event()
+        if stream is None:
+            stream = config.GEMINI_STREAMING
+
+        # Get conversation context
+        chat_context = self.conversation.get_context()
+        
+        corpus = self.corpus
+        # Format files list
+        formatted_files = "\n".join([
+            f"File {i+1}: {filename}" + _merge_note(corpus, filename)
+            for i, filename in enumerate(list(corpus.filenames))
+        ])
+
+        system_instruction = (
+            f"{self._persona_prompt()}\n"
+            "If you're answering a follow-up question, use the conversation history for context."
+        )
+
+        prompt_header = (
+            f"{system_instruction}\n\n"
+            f"--- CONVERSATION HISTORY ---\n{chat_context}\n\n"
+            f"--- FILES ANALYZED ---\n{formatted_files}\n\n"
+            f"--- NEW INSTRUCTION ---\n{instruction}\n\n"
+        )
+        
+        self._log("\n\n====================\nAsking Gemini... Please wait.\n")
+        
+        parts = []
+        client = _get_client()
+        content = None
+        content_tokens = _content_tokens(corpus)
+        # With a cached context the whole corpus is already on the provider's
+        # side, so every question can see all of it at little extra cost
+        caching = (self.context_caching and not corpus.is_empty()
+                   and self.planner.fits(system_instruction, formatted_files, extra_tokens=content_tokens))
+        # Follow-ups rely on the conversation history, so only the passages
+        # relevant to the new question need to be sent again
+        index = self.retrieval_index
+        follow_up = self._asked_corpus is corpus and bool(self.conversation.history)
+        retrieve = index is not None and follow_up
+        if not caching and retrieve:
+            with self.metrics.span("prompt.retrieve"):
+                content = self._retrieve_content(index, instruction)
+        use_corpus = content is None  # The whole corpus is the content, streamed into the prompt
+
+        # Keyed on the content before any map-reduce, so a repeat skips that
+        # too; looked up before a context is cached, so a repeat costs nothing
+        cache_key = None
+        cached_answer = None
+        persona = f"{self.persona.name}\n{self.persona.system_prompt}" if self.persona else ""
+
+        def answer_key():
+            return make_key(config.GEMINI_MODEL, persona, instruction,
+                            f"{chat_context}\n{formatted_files}\n{corpus.fingerprint() if use_corpus else content}")
+
+        if self.response_cache and use_cache:
+            cache_key = answer_key()
+            cached_answer = self.response_cache.get(cache_key)
+
+        cached_context = None
+        if cached_answer is None and caching:
+            cached_context = self._cached_context(
+                client, system_instruction, corpus,
+                f"--- FILES ANALYZED ---\n{formatted_files}\n\n--- CONTENT ---\n"
+            )
+            if cached_context is None and retrieve:
+                # No cached context after all: a follow-up falls back to retrieval
+                with self.metrics.span("prompt.retrieve"):
+                    content = self._retrieve_content(index, instruction)
+                use_corpus = content is None
+                if cache_key and not use_corpus:
+                    cache_key = answer_key()
+
+        if cached_answer is not None:
+            parts.append(cached_answer)
+            self._log(f"--- GEMINI RESPONSE (cached, {self.response_cache.stats.hit_rate:.0%} hit rate) ---\n")
+            self.emit(("answer", cached_answer))
+        elif cached_context is None and not (
+            self.planner.fits(prompt_header, extra_tokens=content_tokens) if use_corpus
+            else self.planner.fits(prompt_header, content)
+        ):
+            # Condensed straight from the per-file text; the full content is never built
+            with self.metrics.span("prompt.map_reduce", chars=corpus.total_chars() if use_corpus else len(content)):
+                content = self._condense_content(client, corpus, instruction, cancel_event, prompt_header)
+            use_corpus = False
+        model = None
+        if cached_answer is not None:
+            final_prompt = ""
+        elif cached_context is not None:
+            model = cached_context.model
+            final_prompt = (
+                f"--- CONVERSATION HISTORY ---\n{chat_context}\n\n"
+                f"--- NEW INSTRUCTION ---\n{instruction}\n\n"
+            )
+        elif use_corpus:
+            with self.metrics.span("prompt.render") as span:
+                final_prompt = "".join([prompt_header, "--- CONTENT ---\n", *corpus.iter_render()])
+                span["chars"] = len(final_prompt)
+        else:
+            final_prompt = f"{prompt_header}--- CONTENT ---\n{content}"
+        if cached_answer is None:
+            self.metrics.incr("prompt.chars", len(final_prompt))
+            self.metrics.incr("prompt.tokens", estimate_tokens(final_prompt))
+        else:
+            self.metrics.incr("response_cache.hits")
+
+        if cancel_event.is_set() or cached_answer is not None:
+            pass
+        elif stream:
+            chunks = client.stream(final_prompt, model=model)
+            self._log("--- GEMINI RESPONSE ---\n")
+            try:
+                for chunk in chunks:
+                    if cancel_event.is_set():
+                        break
+                    text = _chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        self.emit(("answer", text))
+            finally:
+                chunks.close()
+        else:
+            text = client.generate(final_prompt, model=model)
+            if not cancel_event.is_set():
+                parts.append(text)
+                self._log("--- GEMINI RESPONSE ---\n")
+                self.emit(("answer", text))
+
+        answer = "".join(parts)
+        if cancel_event.is_set():
+            self._log("\n--- Response cancelled ---\n")
+            answer += "\n[Response cancelled by user]"
+        elif cache_key and cached_answer is None and answer.strip():
+            self.response_cache.put(cache_key, answer)
+        
+        # Store the conversation; once enough turns have left the window they
+        # are folded into the summary, after the answer has been shown
+        self.conversation.add_message("user", instruction)
+        self.conversation.add_message("assistant", answer)
+        self._asked_corpus = corpus
+        if self.conversation.needs_summary() and not cancel_event.is_set():
+            try:
+                with self.metrics.span("conversation.summarize"):
+                    self.conversation.summarize(client.generate)
+            except Exception as e:
+                self._log(f"\n(Could not update the conversation summary: {e})\n")
+        return answer
+
+    def run_batch(self, instruction: str, cancel_event: Optional[threading.Event] = None) -> List[BatchResult]:
+        run = self.metrics.start_run("batch")
+        try:
+            return self._run_batch(instruction, cancel_event)
+        finally:
+            self._finish_run(run)
+
+    def _run_batch(self, instruction, cancel_event) -> List[BatchResult]:
+        cancel_event = cancel_event or threading.Event()
+        client = _get_client()
+        corpus = self.corpus
+        self._log(f"\n\n====================\nBatch: applying the instruction to each of {len(corpus)} files...\n")
+
+        system_instruction = self._persona_prompt()
+
+        def prepare(filename, text):
+            # Measured with the rest of the prompt the file's text is sent in
+            reserve = self.planner.count_tokens(BATCH_PROMPT.format(
+                system_instruction=system_instruction, instruction=instruction, filename=filename, text=""
+            ))
+            if self.planner.fits(text, extra_tokens=reserve):
+                return text
+            return self.planner.map_reduce(client.generate, instruction, [(filename, text)],
+                                           should_stop=cancel_event.is_set, reserve_tokens=reserve)
+
+        progress = Progress(len(corpus))
+
+        def on_result(result, done, total):
+            progress.done = done
+            if result.error:
+                progress.failed += 1
+                self._log(f"\n--- {result.filename}: FAILED after {result.attempts} attempt(s) ({result.error}) ---\n")
+            else:
+                self._log(f"\n--- {result.filename} ---\n")
+                self.emit(("answer", result.answer.strip() + "\n"))
+            self.emit(("progress", progress))
+
+        runner = BatchRunner(client.generate, concurrency=config.BATCH_CONCURRENCY, max_attempts=config.BATCH_MAX_ATTEMPTS)
+        # Texts are read from the store as workers free up, not all at once
+        results = runner.run(
+            instruction, corpus.iter_documents(), system_instruction=system_instruction,
+            prepare=prepare, on_result=on_result, should_stop=cancel_event.is_set, total=len(corpus)
+        )
+        failed = sum(1 for r in results if r.error)
+        self._log(f"\n--- Batch complete: {len(results) - failed} succeeded, {failed} failed. ---\n")
+        return results
@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from metrics import in_current_run
+
+# Gemini averages roughly four characters per token for English text; close
+# enough for budgeting without a network round-trip to count_tokens.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+@dataclass
+class Chunk:
+    filename: str
+    section: int  # 1-based section number within the file
+    sections: int
+    text: str
+    tokens: int
+
+    @property
+    def label(self) -> str:
+        if self.sections == 1:
+            return self.filename
+        return f"{self.filename} (part {self.section}/{self.sections})"
+
+def _split_text(text: str, max_chars: int) -> List[str]:
+    # Prefer paragraph, then line boundaries; hard-cut only as a last resort
+    pieces = []
+    start = 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        cut = text.rfind("\n\n", start, end)
+        if cut <= start:
+            cut = text.rfind("\n", start, end)
+        if cut <= start:
+            cut = end
+        pieces.append(text[start:cut])
+        start = cut
+    pieces.append(text[start:])
+    return [p for p in pieces if p.strip()]
+
+def chunk_documents(documents: Iterable[Tuple[str, str]], max_chunk_tokens: int,
+                    count_tokens: Callable[[str], int] = estimate_tokens) -> List[Chunk]:
+    chunks = []
+    max_chars = max(1, max_chunk_tokens * CHARS_PER_TOKEN)
+    for filename, text in documents:
+        pieces = [text] if count_tokens(text) <= max_chunk_tokens else _split_text(text, max_chars)
+        for i, piece in enumerate(pieces, start=1):
+            chunks.append(Chunk(filename, i, len(pieces), piece, count_tokens(piece)))
+    return chunks
+
+MAP_PROMPT = (
+    "You are helping answer an instruction over a large set of files that has been split into parts.\n"
+    "Extract and summarize everything in this part that is relevant to the instruction. "
+    "Keep names, numbers, dates and quotes exact. If nothing is relevant, reply with 'Nothing relevant.'\n\n"
+    "--- INSTRUCTION ---\n{instruction}\n\n"
+    "--- PART: {label} ---\n{text}"
+)
+
+REDUCE_PROMPT = (
+    "Combine these partial notes into one set of notes relevant to the instruction. "
+    "Remove repetition but keep every distinct fact and which file it came from.\n\n"
+    "--- INSTRUCTION ---\n{instruction}\n\n"
+    "--- NOTES ---\n{text}"
+)
+
+TRUNCATED_NOTES = "\n\n[... remaining notes cut to fit the token budget ...]"
+
+class PromptTooLarge(Exception):
+    pass
+
+# Decides whether processed content fits in a single prompt and, if it does
+# not, condenses it with a parallel map-reduce over per-file chunks.
+class PromptPlanner:
+    def __init__(self, token_budget: int, chunk_tokens: int, concurrency: int,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.token_budget = token_budget
+        self.chunk_tokens = max(1, min(chunk_tokens, token_budget))
+        self.concurrency = max(1, concurrency)
+        self.count_tokens = count_tokens
+
+    def fits(self, *texts: str, extra_tokens: int = 0) -> bool:
+        # extra_tokens covers content measured without building it
+        return extra_tokens + sum(self.count_tokens(t) for t in texts) <= self.token_budget
+
+    def _run_parallel(self, generate: Callable[[str], str], prompts: List[str],
+                      on_progress: Optional[Callable[[int, int], None]],
+                      should_stop: Callable[[], bool]) -> List[str]:
+        results: List[str] = [""] * len(prompts)
+        done = 0
+
+        def run(i):
+            if should_stop():
+                return i, ""
+            return i, generate(prompts[i])
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="map-reduce") as pool:
+            # API spans from the workers count towards the caller's run
+            for i, text in pool.map(in_current_run(run), range(len(prompts))):
+                results[i] = text
+                done += 1
+                if on_progress:
+                    on_progress(done, len(prompts))
+        return results
+
+    def map_reduce(self, generate: Callable[[str], str], instruction: str,
+                   documents: Iterable[Tuple[str, str]],
+                   on_progress: Optional[Callable[[str, int, int], None]] = None,
+                   should_stop: Callable[[], bool] = lambda: False, reserve_tokens: int = 0) -> str:
+        # The result fits the budget beside reserve_tokens, the rest of the
+        # prompt it will be sent in; raises PromptTooLarge if that can't be done
+        budget = self.token_budget - reserve_tokens
+        if budget <= self.count_tokens(TRUNCATED_NOTES):
+            raise PromptTooLarge(f"Content can't be condensed to fit: the rest of the prompt alone takes "
+                                 f"~{reserve_tokens:,} of the {self.token_budget:,}-token budget "
+                                 f"(shorten the instruction or clear the conversation)")
+        chunks = chunk_documents(documents, self.chunk_tokens, self.count_tokens)
+        prompts = [MAP_PROMPT.format(instruction=instruction, label=c.label, text=c.text) for c in chunks]
+        summaries = self._run_parallel(
+            generate, prompts,
+            (lambda d, t: on_progress("map", d, t)) if on_progress else None, should_stop
+        )
+        notes = [f"[{c.label}]\n{s.strip()}" for c, s in zip(chunks, summaries) if s.strip()]
+
+        # Reduce in groups of up to one chunk until the combined notes fit
+        tokens = self.count_tokens("\n\n".join(notes))
+        while tokens > budget and not should_stop():
+            groups, group, group_tokens = [], [], 0
+            for note in notes:
+                note_tokens = self.count_tokens(note)
+                if group and group_tokens + note_tokens > self.chunk_tokens:
+                    groups.append(group)
+                    group, group_tokens = [], 0
+                group.append(note)
+                group_tokens += note_tokens
+            groups.append(group)
+            prompts = [REDUCE_PROMPT.format(instruction=instruction, text="\n\n".join(g)) for g in groups]
+            reduced = [n for n in self._run_parallel(
+                generate, prompts,
+                (lambda d, t: on_progress("reduce", d, t)) if on_progress else None, should_stop
+            ) if n.strip()]
+            reduced_tokens = self.count_tokens("\n\n".join(reduced))
+            if reduced_tokens >= tokens:
+                break  # The model isn't condensing any further
+            notes, tokens = reduced, reduced_tokens
+        text = "\n\n".join(notes)
+        if tokens > budget and not should_stop():
+            text = self._truncate(text, tokens, budget)
+        return text
+
+    def _truncate(self, text: str, tokens: int, budget: int) -> str:
+        # Last resort: cut the tail and say so, rather than send an oversized prompt
+        budget -= self.count_tokens(TRUNCATED_NOTES)
+        keep = len(text) * budget // max(1, tokens)
+        while keep > 0 and self.count_tokens(text[:keep]) > budget:
+            keep = keep * 9 // 10
+        return text[:keep] + TRUNCATED_NOTES
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+def normalize_instruction(instruction: str) -> str:
+    return " ".join(instruction.lower().split())
+
+def make_key(model_name: str, persona: str, instruction: str, context: str) -> str:
+    context_hash = hashlib.sha256(context.encode('utf-8', errors='ignore')).hexdigest()
+    parts = (model_name, persona, normalize_instruction(instruction), context_hash)
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+# Memoizes Gemini answers: a small in-memory LRU in front of a SQLite store,
+# both subject to a TTL, with the store also capped by size.
+class ResponseCache:
+    def __init__(self, db_path: str, max_bytes: int, ttl_seconds: float, memory_entries: int = 128):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.stats = ResponseCacheStats()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, text)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - ttl_seconds,))
+        self._conn.commit()
+
+    def _remember(self, key: str, created_at: float, text: str):
+        self._memory[key] = (created_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT created_at, data FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], zlib.decompress(row[1]).decode('utf-8'))
+                    self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                self._memory.pop(key, None)
+                self.stats.misses += 1
+                return None
+            self._remember(key, *entry)
+            self.stats.hits += 1
+            return entry[1]
+
+    def put(self, key: str, text: str):
+        now = time.time()
+        data = zlib.compress(text.encode('utf-8'))
+        with self._lock:
+            self._remember(key, now, text)
+            if len(data) > self.max_bytes:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, data, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,68 @@
+import re
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+from prompt_planner import Chunk
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+# In-memory BM25 index over chunks.
+#
+# Postings are stored term-major in flat NumPy arrays (a CSC sparse matrix
+# without the SciPy dependency), so scoring a query only touches the
+# postings of its own terms.
+class RetrievalIndex:
+    def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+
+        term_ids, doc_ids, counts = [], [], []
+        doc_lengths = np.zeros(len(chunks), dtype=np.float32)
+        for doc_id, chunk in enumerate(chunks):
+            # File names are searchable too, so "what does report.pdf say" works
+            tf = Counter(tokenize(chunk.filename) + tokenize(chunk.text))
+            doc_lengths[doc_id] = sum(tf.values())
+            for term, count in tf.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_id)
+                counts.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self._doc_ids = np.asarray(doc_ids, dtype=np.int64)[order]
+        self._tf = np.asarray(counts, dtype=np.float32)[order]
+        doc_freq = np.bincount(term_ids, minlength=len(self.vocab))
+        self._indptr = np.concatenate(([0], np.cumsum(doc_freq)))
+
+        n = max(len(chunks), 1)
+        self._idf = np.log1p((n - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        avg_length = doc_lengths.mean() if len(chunks) else 1.0
+        self._norm = (k1 * (1 - b + b * doc_lengths / max(avg_length, 1.0))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[Chunk, float]]:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            docs = self._doc_ids[start:end]
+            tf = self._tf[start:end]
+            scores[docs] += self._idf[term_id] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+
+        top_k = min(top_k, len(self.chunks))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.chunks[i], float(scores[i])) for i in top if scores[i] > 0]
@@ -0,0 +1,150 @@
+import errno
+import hashlib
+import getpass
+import os
+import secrets
+import sys
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Callable, List, Optional, Sequence
+
+import config
+
+ERROR_ALREADY_EXISTS = 183
+
+# Context-menu launches hand their paths to the running app instead of
+# starting a second copy. The resident instance listens on a named pipe
+# (Windows) or a Unix socket in DATA_DIR; connections are authenticated
+# with a per-user key stored next to it.
+
+def default_address():
+    user = hashlib.sha1(getpass.getuser().encode("utf-8")).hexdigest()[:8]
+    if sys.platform == "win32":
+        return rf"\\.\pipe\GeminiCopilot-{user}", "AF_PIPE"
+    return os.path.join(config.DATA_DIR, f"instance-{user}.sock"), "AF_UNIX"
+
+def default_authkey() -> bytes:
+    path = os.path.join(config.DATA_DIR, "instance.key")
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+        if key:
+            return key
+    except FileNotFoundError:
+        pass
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    key = secrets.token_bytes(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+def _acquire_mutex(address: str):
+    # Windows lets any number of processes create instances of the same
+    # named pipe, so the listener alone doesn't make one instance the
+    # server; a named mutex does. Returns its handle, or None if taken.
+    import ctypes
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateMutexW.restype = wintypes.HANDLE
+    kernel32.CreateMutexW.argtypes = (wintypes.LPVOID, wintypes.BOOL, wintypes.LPCWSTR)
+    handle = kernel32.CreateMutexW(None, False, "Local\\" + address.rsplit("\\", 1)[-1])
+    if not handle:
+        raise ctypes.WinError(ctypes.get_last_error())
+    if ctypes.get_last_error() == ERROR_ALREADY_EXISTS:
+        kernel32.CloseHandle(wintypes.HANDLE(handle))
+        return None
+    return handle
+
+def _release_mutex(handle):
+    import ctypes
+    from ctypes import wintypes
+    ctypes.WinDLL("kernel32").CloseHandle(wintypes.HANDLE(handle))
+
+def forward(paths: Sequence[str], address=None, family=None, authkey: Optional[bytes] = None,
+            timeout: float = 5.0) -> bool:
+    # True if a running instance accepted the paths (an empty list just
+    # brings its window forward); False if none is listening
+    if address is None:
+        address, family = default_address()
+    try:
+        conn = Client(address, family, authkey=authkey or default_authkey())
+    except (OSError, EOFError, AuthenticationError):
+        return False
+    with conn:
+        conn.send({"paths": [os.path.abspath(p) for p in paths]})
+        return conn.poll(timeout) and conn.recv() == "ok"
+
+class InstanceServer:
+    def __init__(self, on_paths: Callable[[List[str]], None], address=None, family=None,
+                 authkey: Optional[bytes] = None):
+        if address is None:
+            address, family = default_address()
+        self.address = address
+        self.family = family
+        self.authkey = authkey
+        self.on_paths = on_paths
+        self._listener: Optional[Listener] = None
+        self._mutex = None  # Windows only
+        self._closed = threading.Event()
+
+    def _listen(self) -> Listener:
+        try:
+            return Listener(self.address, self.family, authkey=self.authkey)
+        except OSError as e:
+            # A socket file left behind by a crashed instance refuses
+            # connections; anything that still answers is a live instance
+            if self.family != "AF_UNIX" or e.errno != errno.EADDRINUSE:
+                raise
+            if forward([], self.address, self.family, self.authkey, timeout=1.0):
+                raise
+            os.unlink(self.address)
+            return Listener(self.address, self.family, authkey=self.authkey)
+
+    def start(self) -> bool:
+        # Returns False if another instance already owns the address
+        if self.authkey is None:
+            self.authkey = default_authkey()
+        if self.family == "AF_UNIX":
+            os.makedirs(os.path.dirname(self.address) or ".", exist_ok=True)
+        elif self.family == "AF_PIPE":
+            self._mutex = _acquire_mutex(self.address)
+            if self._mutex is None:
+                return False
+        try:
+            self._listener = self._listen()
+        except OSError:
+            self._release()
+            return False
+        threading.Thread(target=self._serve, args=(self._listener,), daemon=True, name="instance-server").start()
+        return True
+
+    def _serve(self, listener: Listener):
+        while not self._closed.is_set():
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed.is_set():
+                    return
+                continue  # Failed handshake (e.g. wrong key); keep listening
+            try:
+                with conn:
+                    message = conn.recv()
+                    paths = [p for p in message.get("paths", []) if isinstance(p, str)]
+                    conn.send("ok")
+                self.on_paths(paths)
+            except Exception as e:
+                print(f"Ignoring message from another instance: {e}")
+
+    def _release(self):
+        if self._mutex is not None:
+            _release_mutex(self._mutex)
+            self._mutex = None
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()  # Also removes the Unix socket file
+            self._listener = None
+        self._release()
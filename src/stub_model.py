@@ -0,0 +1,46 @@
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+@dataclass
+class StubResponse:
+    text: str
+
+# Offline stand-in for genai.GenerativeModel, selected with GEMINI_MODEL=stub.
+# It echoes a digest of the prompt so the whole pipeline can run without an
+# API key or network access. With a url it instead posts generateContent
+# requests to a local stub server (see benchmarks/stub_server.py), so the
+# HTTP path, retries and latency can be exercised too. Pass the client's
+# session so those requests reuse its pooled connections.
+class StubModel:
+    model_name = "stub"
+
+    def __init__(self, latency: float = 0.0, chunk_size: int = 40, url: Optional[str] = None, session=None):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.url = url
+        self.session = session
+
+    def _answer(self, prompt: str) -> str:
+        if self.url:
+            session = self.session
+            if session is None:
+                import requests
+                session = requests
+            response = session.post(self.url, json={"contents": [{"parts": [{"text": prompt}]}]}, timeout=60)
+            response.raise_for_status()
+            return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+        first_line = prompt.strip().splitlines()[0] if prompt.strip() else ""
+        return f"[stub answer] {len(prompt)} chars in prompt. First line: {first_line[:120]}"
+
+    def _stream(self, text: str) -> Iterator[StubResponse]:
+        for i in range(0, len(text), self.chunk_size):
+            yield StubResponse(text[i:i + self.chunk_size])
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._answer(prompt)
+        if stream:
+            return self._stream(text)
+        return StubResponse(text)
@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from content_store import ContentStore
+from corpus import Corpus
+
+def _corpus(limit_bytes: int) -> Corpus:
+    corpus = Corpus("", ContentStore(limit_bytes), labelled=True)
+    for i in range(6):
+        corpus.upsert(os.path.join("docs", f"f{i}.txt"), f"file {i} " * 2000)
+    return corpus
+
+class RemoveDuringIterationTest(unittest.TestCase):
+    # Watch-mode patches run on the UI thread while workers iterate the corpus
+    def test_iter_documents_skips_removed(self):
+        for limit in (0, 20000):  # All resident, then mostly spilled
+            corpus = _corpus(limit)
+            seen = []
+            for filename, text in corpus.iter_documents():
+                seen.append(filename)
+                if filename == "f1.txt":
+                    corpus.remove(os.path.join("docs", "f2.txt"))
+                    corpus.remove(os.path.join("docs", "f0.txt"))
+                    corpus.upsert(os.path.join("docs", "f3.txt"), "edited")
+                if filename == "f3.txt":
+                    self.assertEqual(text, "edited")
+            self.assertEqual(seen, ["f0.txt", "f1.txt", "f3.txt", "f4.txt", "f5.txt"])
+            corpus.close()
+
+    def test_iter_render_finishes_document_being_written(self):
+        for limit in (0, 20000):
+            corpus = _corpus(limit)
+            pieces = []
+            for piece in corpus.iter_render():
+                pieces.append(piece)
+                if piece == "--- Content of f4.txt ---\n":
+                    corpus.remove(os.path.join("docs", "f4.txt"))
+                    corpus.remove(os.path.join("docs", "f5.txt"))
+                    # Enough new text to reuse any freed spill space
+                    corpus.upsert(os.path.join("docs", "new.txt"), "x" * 40000)
+            rendered = "".join(pieces)
+            self.assertIn("--- Content of f4.txt ---\n" + "file 4 " * 2000 + "\n\n", rendered)
+            self.assertNotIn("f5.txt", rendered)
+            corpus.close()
+
+class SpillSpaceTest(unittest.TestCase):
+    def test_released_space_is_reused(self):
+        store = ContentStore(limit_bytes=1)
+        for i in range(50):
+            text = f"{i:02d}" * 50000
+            segment = store.put(text)
+            store.put("")  # Pushes the previous segment out to the spill file
+            self.assertEqual(store.text(segment), text)
+            store.release(segment)
+        self.assertLessEqual(store._block_used, 200000)
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()